@@ -2,15 +2,172 @@
 LLM Client: Provides a unified interface for different LLM providers.
 """
 
-from typing import Dict, Any, List, NamedTuple
+import asyncio
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Any, AsyncIterator, Callable, Hashable, List, Optional, Tuple
 
 from utils.logger import get_logger
 
+# Import tiktoken for token counting if available
+try:
+    import tiktoken
+    has_tiktoken = True
+except ImportError:
+    has_tiktoken = False
+
+# Import autogen 0.4 components once; the message and token classes are used on every request
+try:
+    from autogen_ext.models.openai import OpenAIChatCompletionClient
+    from autogen_agentchat.agents import AssistantAgent
+    from autogen_agentchat.base import Response
+    from autogen_agentchat.messages import ModelClientStreamingChunkEvent, TextMessage
+    from autogen_core import CancellationToken
+    autogen_import_error = None
+except ImportError as e:
+    autogen_import_error = e
+
 # Configure logger
 logger = get_logger(__name__)
 
-class LLMResponse(NamedTuple):
+
+@lru_cache(maxsize=4)
+def _get_encoding(name: str):
+    """
+    Load a tiktoken encoding once per process.
+
+    Building the BPE tables is slow, so every client sharing an encoding
+    reuses the same object.
+
+    Args:
+        name: Name of the tiktoken encoding
+
+    Returns:
+        The tiktoken Encoding instance
+    """
+    return tiktoken.get_encoding(name)
+
+
+# Texts longer than this are encoded directly instead of being memoized
+_TOKEN_CACHE_MAX_CHARS = 64_000
+
+# Worker threads used by tiktoken when encoding several long texts at once
+_ENCODE_BATCH_THREADS = 4
+
+# Maximum number of responses kept in each client's response cache
+_RESPONSE_CACHE_SIZE = 512
+
+# Connection pool limits for the HTTP client shared by all LLM clients
+_HTTP_MAX_CONNECTIONS = 2000
+_HTTP_MAX_KEEPALIVE_CONNECTIONS = 1500
+_HTTP_TIMEOUT = 120
+
+
+@lru_cache(maxsize=4096)
+def _encoded_len(encoding, text: str) -> int:
+    """
+    Count tokens for a text, memoized on (encoding, text).
+
+    System prompts and re-sent history repeat across calls, so repeated
+    strings skip the BPE pass entirely.
+
+    Args:
+        encoding: tiktoken Encoding to use
+        text: The text to count tokens for
+
+    Returns:
+        Number of tokens
+    """
+    return _count_encoded(encoding, text)
+
+
+def _count_encoded(encoding, text: str) -> int:
+    """
+    Count tokens without special-token handling.
+
+    encode_ordinary skips the allowed/disallowed special-token scan that
+    encode() performs, and treats special-token text as plain text instead
+    of raising on it.
+
+    Args:
+        encoding: tiktoken Encoding to use
+        text: The text to count tokens for
+
+    Returns:
+        Number of tokens
+    """
+    return len(encoding.encode_ordinary(text))
+
+
+# HTTP clients shared by all LLM clients, one per event loop
+_SHARED_HTTP_CLIENTS: Dict[asyncio.AbstractEventLoop, Any] = {}
+
+
+def _for_running_loop(cache: Dict[asyncio.AbstractEventLoop, Any], factory: Callable[[], Any]) -> Any:
+    """
+    Get the object kept for the running event loop, creating it on first use.
+
+    Connection pools are bound to the loop they first run on, and the tests
+    and main.py each start a new loop with asyncio.run, so pooled objects
+    are kept per loop. Entries of loops that have since closed are dropped;
+    their connections cannot be closed from another loop.
+
+    Args:
+        cache: Objects keyed by event loop
+        factory: Creates the object for a loop without one
+
+    Returns:
+        The object for the running loop
+    """
+    loop = asyncio.get_running_loop()
+    for closed_loop in [cached_loop for cached_loop in cache if cached_loop.is_closed()]:
+        del cache[closed_loop]
+
+    value = cache.get(loop)
+    if value is None:
+        value = cache[loop] = factory()
+    return value
+
+
+def _new_http_client():
+    """
+    Create an HTTP client for reaching LLM endpoints.
+
+    Returns:
+        httpx.AsyncClient with pool limits sized for concurrent agents
+    """
+    import httpx
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=_HTTP_MAX_KEEPALIVE_CONNECTIONS
+        ),
+        timeout=httpx.Timeout(_HTTP_TIMEOUT)
+    )
+
+
+def _get_shared_http_client():
+    """
+    Get the HTTP client used to reach LLM endpoints from the running loop.
+
+    Agents running concurrently share one warm connection pool instead of
+    each OpenAI client creating its own with default limits.
+
+    Returns:
+        The shared httpx.AsyncClient of the running event loop
+    """
+    return _for_running_loop(_SHARED_HTTP_CLIENTS, _new_http_client)
+
+@dataclass(frozen=True)
+class LLMResponse:
     """Response from an LLM."""
+    __slots__ = ("content", "model", "usage")
+
     content: str
     model: str
     usage: Dict[str, int]
@@ -42,6 +199,43 @@ class LLMClient:
         """
         raise NotImplementedError("Subclasses must implement generate_response()")
 
+    async def generate_response_stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[LLMResponse]:
+        """
+        Generate a response from the LLM, yielding content chunks as they arrive.
+
+        Clients without native streaming yield the full response as one chunk.
+
+        Args:
+            messages: List of message objects
+
+        Yields:
+            Partial responses whose contents concatenate to the full response
+        """
+        yield await self.generate_response(messages)
+
+    async def generate_responses(
+        self,
+        batch: List[List[Dict[str, str]]],
+        max_concurrency: int = 8
+    ) -> List[LLMResponse]:
+        """
+        Generate responses for several independent message lists concurrently.
+
+        Args:
+            batch: List of message lists, one per request
+            max_concurrency: Maximum number of requests in flight at once
+
+        Returns:
+            Generated responses, in the same order as the batch
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def _generate(messages: List[Dict[str, str]]) -> LLMResponse:
+            async with semaphore:
+                return await self.generate_response(messages)
+
+        return await asyncio.gather(*(_generate(messages) for messages in batch))
+
 
 class CustomClient(LLMClient):
     """
@@ -61,26 +255,31 @@ class CustomClient(LLMClient):
         self.temperature = config.get("temperature", 0.1)
         self.max_tokens = config.get("max_tokens", 50000)
 
-        # Import required autogen components
-        try:
-            from autogen_ext.models.openai import OpenAIChatCompletionClient
-            from autogen_agentchat.agents import AssistantAgent
-            from autogen_agentchat.messages import TextMessage
-            from autogen_core import CancellationToken
+        # Cache responses to repeated message lists
+        self.enable_response_cache = config.get("enable_response_cache", True)
+        self._response_cache: "OrderedDict[bytes, LLMResponse]" = OrderedDict()
+        self.cache_hits = 0
 
-            # Import tiktoken for token counting if available
-            try:
-                import tiktoken
+        # Usage source that last reported usage, see _extract_usage
+        self._usage_extractor: Optional[Callable[["CustomClient", Any], Any]] = None
+
+        # Open a connection to the endpoint ahead of the first request
+        self.prewarm = config.get("prewarm", True)
+        self._prewarm_task: Optional[asyncio.Task] = None
+
+        # Check that the required autogen components were imported
+        if autogen_import_error is None:
+            # Use tiktoken for token counting if available
+            if has_tiktoken:
                 self.tiktoken_available = True
-                self.encoding = tiktoken.get_encoding("cl100k_base")  # OpenAI's default encoding
-            except ImportError:
+                self.encoding = _get_encoding("cl100k_base")  # OpenAI's default encoding
+            else:
                 logger.warning("tiktoken not available, token usage will be estimated")
                 self.tiktoken_available = False
                 self.encoding = None
 
-            # Store these classes for later use
-            self.TextMessage = TextMessage
-            self.CancellationToken = CancellationToken
+            # Model clients, one per event loop since each holds that loop's HTTP client
+            self._model_clients: Optional[Dict[asyncio.AbstractEventLoop, Any]] = {}
 
             # Create the model client
             # self.model_client = OpenAIChatCompletionClient(
@@ -97,54 +296,289 @@ class CustomClient(LLMClient):
             #     max_tokens=self.max_tokens
             # )
 
+            if self.prewarm:
+                self._schedule_prewarm()
 
-            self.model_client = OpenAIChatCompletionClient(
-                model=self.model,
-                api_key="NotRequiredSinceWeAreLocal",
-                base_url=self.api_base,
-                model_capabilities={
-                    "json_output": True,
-                    "vision": False,
-                    "function_calling": True,
-                },
-                temperature=self.temperature,
-                seed=42,
-                max_tokens=self.max_tokens
-            )
-
-            # Create an assistant agent
-            self.assistant = AssistantAgent(
-                name="LLMAssistant",
-                model_client=self.model_client,
-                system_message="You are a helpful AI assistant."
-            )
-
-        except ImportError as e:
-            logger.error(f"Failed to import required libraries from autogen 0.4: {str(e)}")
-            self.model_client = None
-            self.assistant = None
-            self.TextMessage = None
-            self.CancellationToken = None
+        else:
+            logger.error(f"Failed to import required libraries from autogen 0.4: {str(autogen_import_error)}")
+            self._model_clients = None
             self.tiktoken_available = False
             self.encoding = None
 
-    def _count_tokens(self, text: str) -> int:
+    def _get_model_client(self) -> "OpenAIChatCompletionClient":
+        """
+        Get the model client for the running event loop.
+
+        Returns:
+            OpenAI-compatible model client using the loop's shared HTTP client
+        """
+        return _for_running_loop(self._model_clients, lambda: OpenAIChatCompletionClient(
+            model=self.model,
+            api_key="NotRequiredSinceWeAreLocal",
+            base_url=self.api_base,
+            model_capabilities={
+                "json_output": True,
+                "vision": False,
+                "function_calling": True,
+            },
+            temperature=self.temperature,
+            seed=42,
+            max_tokens=self.max_tokens,
+            http_client=_get_shared_http_client()
+        ))
+
+    def _new_assistant(self, stream: bool = False) -> "AssistantAgent":
+        """
+        Create an assistant agent for a single request.
+
+        An assistant keeps every message it handles in its model context, and
+        this client is shared by all agents with the same configuration, so
+        each request gets a fresh assistant instead of one shared history.
+
+        Args:
+            stream: Whether the model should stream its response; only
+                generate_response_stream consumes the chunks
+
+        Returns:
+            Assistant agent on this client's model client
+        """
+        return AssistantAgent(
+            name="LLMAssistant",
+            model_client=self._get_model_client(),
+            system_message="You are a helpful AI assistant.",
+            model_client_stream=stream
+        )
+
+    def _schedule_prewarm(self) -> None:
+        """
+        Schedule a connection prewarm on the running event loop.
+
+        Clients constructed outside an event loop skip the prewarm; their
+        first request opens the connection as before.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.debug("No running event loop, skipping LLM connection prewarm")
+            return
+
+        # Keep a reference so the task is not garbage collected mid-flight
+        self._prewarm_task = loop.create_task(self._prewarm())
+
+    async def _prewarm(self) -> None:
+        """
+        Open a pooled connection to the LLM endpoint so the first request
+        does not pay for the TCP/TLS handshake.
+        """
+        try:
+            await _get_shared_http_client().head(self.api_base)
+        except Exception as e:
+            logger.debug(f"LLM connection prewarm failed: {str(e)}")
+
+    def _count_tokens(self, text: str, exact: bool = True) -> int:
         """
         Count the number of tokens in a text string.
         
         Args:
             text: The text to count tokens for
+            exact: Whether to run the tokenizer; when False, estimate from the
+                character count without encoding
             
         Returns:
             Number of tokens
         """
+        if not exact:
+            return max(1, len(text) >> 2)
+
         if self.tiktoken_available and self.encoding:
             # Use tiktoken for accurate token counting
-            return len(self.encoding.encode(text))
+            if len(text) < _TOKEN_CACHE_MAX_CHARS:
+                return _encoded_len(self.encoding, text)
+            return _count_encoded(self.encoding, text)
         else:
             # Fallback to a rough estimation (4 characters ≈ 1 token)
             return max(1, len(text) // 4)
 
+    def _count_tokens_batch(self, texts: List[str]) -> int:
+        """
+        Count the total number of tokens across several text strings.
+
+        Short texts go through the memoized counter; long texts are encoded
+        together with tiktoken's threaded batch encoder, which releases the
+        GIL while encoding.
+
+        Args:
+            texts: The texts to count tokens for
+
+        Returns:
+            Total number of tokens
+        """
+        if not (self.tiktoken_available and self.encoding):
+            return sum(self._count_tokens(text) for text in texts)
+
+        total = 0
+        long_texts = []
+        for text in texts:
+            if len(text) < _TOKEN_CACHE_MAX_CHARS:
+                total += _encoded_len(self.encoding, text)
+            else:
+                long_texts.append(text)
+
+        if len(long_texts) == 1:
+            total += _count_encoded(self.encoding, long_texts[0])
+        elif long_texts:
+            encoded = self.encoding.encode_ordinary_batch(long_texts, num_threads=_ENCODE_BATCH_THREADS)
+            total += sum(map(len, encoded))
+
+        return total
+
+    def _usage_from_message(self, response: Any) -> Any:
+        """Usage autogen attaches to the response message (all zeros when not reported)."""
+        models_usage = response.chat_message.models_usage
+        if models_usage is not None and (models_usage.prompt_tokens or models_usage.completion_tokens):
+            return models_usage
+        return None
+
+    def _usage_from_last_response(self, response: Any) -> Any:
+        """Usage on the model client's raw last response."""
+        return self._get_model_client().last_response.usage
+
+    def _usage_from_metadata(self, response: Any) -> Any:
+        """Usage in the response metadata."""
+        return response.metadata.get("usage")
+
+    def _usage_from_response(self, response: Any) -> Any:
+        """Usage on the response object itself."""
+        return response.usage
+
+    # Usage sources, in order of preference
+    _usage_sources = (
+        _usage_from_message,
+        _usage_from_last_response,
+        _usage_from_metadata,
+        _usage_from_response,
+    )
+
+    def _extract_usage(self, response: Any) -> Optional[Dict[str, int]]:
+        """
+        Extract the token usage reported by the model for a response.
+
+        A given client and response type always report usage in the same
+        place, so the first source that succeeds is remembered and tried
+        first on later calls.
+
+        Args:
+            response: Response returned by the assistant
+
+        Returns:
+            Usage dictionary, or None if the model did not report usage
+        """
+        if self._usage_extractor is not None:
+            try:
+                response_usage = self._usage_extractor(self, response)
+            except (AttributeError, TypeError):
+                response_usage = None
+            if response_usage is not None:
+                return self._usage_to_dict(response_usage)
+
+        for extractor in self._usage_sources:
+            try:
+                response_usage = extractor(self, response)
+            except (AttributeError, TypeError):
+                continue
+            if response_usage is not None:
+                self._usage_extractor = extractor
+                return self._usage_to_dict(response_usage)
+
+        return None
+
+    def _usage_to_dict(self, response_usage: Any) -> Dict[str, int]:
+        """
+        Normalize a usage object or dictionary into a usage dictionary.
+
+        Cached prompt tokens are included when the endpoint reports them, so
+        callers can report prompt-cache hit rates.
+
+        Args:
+            response_usage: Usage object or dictionary reported by the model
+
+        Returns:
+            Usage dictionary with prompt, completion and total token counts
+        """
+        if isinstance(response_usage, dict):
+            usage = dict(response_usage)
+            details = usage.get("prompt_tokens_details") or {}
+            cached_tokens = details.get("cached_tokens") if isinstance(details, dict) else None
+        else:
+            usage = {
+                "prompt_tokens": response_usage.prompt_tokens,
+                "completion_tokens": response_usage.completion_tokens
+            }
+            total_tokens = getattr(response_usage, "total_tokens", None)
+            if total_tokens is not None:
+                usage["total_tokens"] = total_tokens
+            details = getattr(response_usage, "prompt_tokens_details", None)
+            cached_tokens = getattr(details, "cached_tokens", None)
+
+        usage.setdefault("total_tokens", usage["prompt_tokens"] + usage["completion_tokens"])
+        if cached_tokens is not None:
+            usage["cached_tokens"] = cached_tokens
+        return usage
+
+    def _response_cache_key(self, messages: List[Dict[str, str]]) -> bytes:
+        """
+        Build the response cache key for a message list.
+
+        Args:
+            messages: List of message objects
+
+        Returns:
+            Digest of the serialized message list
+        """
+        serialized = json.dumps(messages, sort_keys=True).encode("utf-8")
+        return hashlib.blake2b(serialized, digest_size=16).digest()
+
+    def _cache_response(self, cache_key: bytes, response: LLMResponse) -> None:
+        """
+        Store a response in the cache, evicting the least recently used entry when full.
+
+        Args:
+            cache_key: Key from _response_cache_key()
+            response: Response to cache
+        """
+        self._response_cache[cache_key] = response
+        self._response_cache.move_to_end(cache_key)
+        if len(self._response_cache) > _RESPONSE_CACHE_SIZE:
+            self._response_cache.popitem(last=False)
+
+    def _split_messages(
+        self,
+        messages: List[Dict[str, str]]
+    ) -> Tuple[Optional[str], Optional[str], List[str]]:
+        """
+        Split a message list in a single pass.
+
+        Args:
+            messages: List of message objects
+
+        Returns:
+            Tuple of (first system message, last user message, all message texts);
+            the messages are None when no message with that role is present
+        """
+        system_message = None
+        user_message = None
+        texts = []
+        for message in messages:
+            role = message["role"]
+            content = message["content"]
+            texts.append(content)
+            if role == "system":
+                if system_message is None:
+                    system_message = content
+            elif role == "user":
+                user_message = content
+        return system_message, user_message, texts
+
     async def generate_response(self, messages: List[Dict[str, str]]) -> LLMResponse:
         """
         Generate a response using autogen 0.4.
@@ -155,37 +589,33 @@ class CustomClient(LLMClient):
         Returns:
             Generated response
         """
-        if not self.assistant:
+        if self._model_clients is None:
             logger.error("Autogen assistant not initialized")
             return LLMResponse(content="Error: Autogen assistant not initialized", model=self.model, usage={})
 
+        # Serve repeated message lists from the response cache
+        cache_key = None
+        if self.enable_response_cache:
+            cache_key = self._response_cache_key(messages)
+            cached_response = self._response_cache.get(cache_key)
+            if cached_response is not None:
+                self._response_cache.move_to_end(cache_key)
+                self.cache_hits += 1
+                logger.debug(f"Response cache hit ({self.cache_hits} total)")
+                return cached_response
+
         try:
-            # Extract system message if present
-            system_message = None
-            for message in messages:
-                if message["role"] == "system":
-                    system_message = message["content"]
-                    break
-
-            # Convert messages to format expected by autogen
+            # Extract the system message, last user message and message texts in one pass
             # We only use the last user message for simplicity
-            user_messages = [msg for msg in messages if msg["role"] == "user"]
-            if not user_messages:
+            system_message, user_message, texts = self._split_messages(messages)
+            if user_message is None:
                 # If no user message, return an error
                 return LLMResponse(content="Error: No user message provided", model=self.model, usage={})
             
-            # Use the last user message
-            user_message = user_messages[-1]["content"]
-            
-            # Track token usage - compute prompt tokens
-            prompt_tokens = 0
-            for message in messages:
-                prompt_tokens += self._count_tokens(message["content"])
-            
             # Generate response using autogen's on_messages method
-            response = await self.assistant.on_messages(
-                [self.TextMessage(content=user_message, source="user")],
-                cancellation_token=self.CancellationToken()
+            response = await self._new_assistant().on_messages(
+                [TextMessage(content=user_message, source="user")],
+                cancellation_token=CancellationToken()
             )
             
             # Extract content from the response
@@ -196,57 +626,151 @@ class CustomClient(LLMClient):
             else:
                 content = str(response)
             
-            # Track token usage - compute completion tokens
-            completion_tokens = self._count_tokens(content)
-            
-            # Get the metadata from the model_client if available
-            usage = {
-                "prompt_tokens": prompt_tokens,
-                "completion_tokens": completion_tokens,
-                "total_tokens": prompt_tokens + completion_tokens
-            }
-            
-            # Try to get the actual usage from the model response metadata if available
+            # Prefer the usage reported by the model; endpoints almost always return it
+            usage = None
             try:
-                # Check if we can access the raw response or usage info
-                if hasattr(self.model_client, "last_response") and hasattr(self.model_client.last_response, "usage"):
-                    # Extract usage from the last response
-                    response_usage = self.model_client.last_response.usage
-                    usage = {
-                        "prompt_tokens": response_usage.prompt_tokens,
-                        "completion_tokens": response_usage.completion_tokens,
-                        "total_tokens": response_usage.total_tokens
-                    }
-                # Check if usage info is in the assistant's metadata
-                elif hasattr(response, "metadata") and "usage" in response.metadata:
-                    usage = response.metadata["usage"]
-                # Check if usage is directly on the assistant
-                elif hasattr(self.assistant, "usage") and self.assistant.usage:
-                    usage = self.assistant.usage
-                # Try to get usage from the response object
-                elif hasattr(response, "usage"):
-                    usage = response.usage
+                usage = self._extract_usage(response)
             except Exception as e:
-                logger.warning(f"Could not extract exact usage information: {str(e)}")
+                logger.warning("Could not extract exact usage information: %s", e)
+            
+            # Fall back to counting tokens locally
+            if usage is None:
+                prompt_tokens = self._count_tokens_batch(texts)
+                completion_tokens = self._count_tokens(content)
+                usage = {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens
+                }
                 
-            logger.info(f"Usage - Prompt tokens: {usage['prompt_tokens']}, " + 
-                       f"Completion tokens: {usage['completion_tokens']}, " +
-                       f"Total tokens: {usage['total_tokens']}")
+            logger.info("Usage - Prompt tokens: %d, Completion tokens: %d, Total tokens: %d",
+                        usage["prompt_tokens"], usage["completion_tokens"], usage["total_tokens"])
 
-            return LLMResponse(content=content, model=self.model, usage=usage)
+            llm_response = LLMResponse(content=content, model=self.model, usage=usage)
+            if cache_key is not None:
+                self._cache_response(cache_key, llm_response)
+
+            return llm_response
 
         except Exception as e:
             error_msg = f"Error generating response using autogen: {str(e)}"
             logger.error(error_msg)
             return LLMResponse(content=f"Error: {error_msg}", model=self.model, usage={})
 
+    async def generate_response_stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[LLMResponse]:
+        """
+        Generate a response using autogen 0.4, yielding chunks as they are produced.
+
+        Each yielded response carries one content chunk and the usage
+        accumulated so far; joining the chunk contents gives the full response.
+
+        Args:
+            messages: List of message objects
+
+        Yields:
+            Partial responses
+        """
+        if self._model_clients is None:
+            logger.error("Autogen assistant not initialized")
+            yield LLMResponse(content="Error: Autogen assistant not initialized", model=self.model, usage={})
+            return
+
+        try:
+            # We only use the last user message for simplicity
+            _, user_message, texts = self._split_messages(messages)
+            if user_message is None:
+                yield LLMResponse(content="Error: No user message provided", model=self.model, usage={})
+                return
+
+            prompt_tokens = self._count_tokens_batch(texts)
+            completion_tokens = 0
+            streamed = False
+
+            stream = self._new_assistant(stream=True).on_messages_stream(
+                [TextMessage(content=user_message, source="user")],
+                cancellation_token=CancellationToken()
+            )
+            async for event in stream:
+                if isinstance(event, ModelClientStreamingChunkEvent):
+                    chunk = event.content
+                    streamed = True
+                elif isinstance(event, Response) and not streamed:
+                    # The model did not stream, so emit the final message whole
+                    chunk = event.chat_message.content
+                else:
+                    continue
+
+                # Chunk boundaries split tokens, so per-chunk counts are estimates anyway
+                completion_tokens += self._count_tokens(chunk, exact=False)
+                yield LLMResponse(
+                    content=chunk,
+                    model=self.model,
+                    usage={
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens
+                    }
+                )
+
+        except Exception as e:
+            error_msg = f"Error streaming response using autogen: {str(e)}"
+            logger.error(error_msg)
+            yield LLMResponse(content=f"Error: {error_msg}", model=self.model, usage={})
+
+
+
+
+def _config_key(config: Dict[str, Any]) -> Tuple[Tuple[str, Any], ...]:
+    """
+    Build a hashable key for a provider configuration.
+
+    Non-hashable values are stringified; CustomClient only reads scalar
+    settings, so this does not change the client that gets built.
+
+    Args:
+        config: Provider configuration
+
+    Returns:
+        Sorted tuple of (key, value) pairs
+    """
+    return tuple(sorted(
+        (key, value if isinstance(value, Hashable) else repr(value))
+        for key, value in config.items()
+    ))
 
 
+# LLM clients shared by every caller with the same provider configuration
+_CLIENT_POOL: Dict[Tuple[Tuple[str, Any], ...], LLMClient] = {}
+_CLIENT_POOL_LOCK = threading.Lock()
+
+
+def _client_for(config_key: Tuple[Tuple[str, Any], ...]) -> LLMClient:
+    """
+    Build an LLM client once per distinct provider configuration.
+
+    The pool is guarded by a lock, so agents created from several threads
+    build a client only once.
+
+    Args:
+        config_key: Hashable configuration key from _config_key()
+
+    Returns:
+        LLM client instance shared by every caller with the same configuration
+    """
+    with _CLIENT_POOL_LOCK:
+        client = _CLIENT_POOL.get(config_key)
+        if client is None:
+            client = _CLIENT_POOL[config_key] = CustomClient(dict(config_key))
+    return client
+
 
 def create_llm_client(config: Dict[str, Any]) -> LLMClient:
     """
     Create an LLM client based on configuration.
 
+    Clients are pooled per provider configuration, so repeated calls with
+    the same configuration reuse a warm client instead of rebuilding it.
+
     Args:
         config: LLM configuration
 
@@ -273,6 +797,6 @@ def create_llm_client(config: Dict[str, Any]) -> LLMClient:
     # else:
     #     logger.warning(f"Unknown LLM provider type: {api_type}, defaulting to OpenAI")
     #     return OpenAIClient(provider_config)
-    return CustomClient(provider_config)
+    return _client_for(_config_key(provider_config))
 
 
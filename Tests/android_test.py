@@ -1,18 +1,24 @@
 import unittest
 import asyncio
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 import sys
 import os
+from typing import ClassVar
 
 # Add the project root to the path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from agents.checker_agent import CheckerAgent
+from agents.checker_agent import CheckerAgent, _parse_page
 from core.context_manager import ContextManager
 
-class TestAndroidCheckerAgent(unittest.TestCase):
+class TestAndroidCheckerAgent(unittest.IsolatedAsyncioTestCase):
     """Test the enhanced CheckerAgent with Android page sources."""
 
+    # Large page source with the target element beyond 5000 characters, built once
+    LARGE_PREFIX: ClassVar[str] = '<hierarchy><android.widget.FrameLayout>' + '<android.view.View></android.view.View>' * 500
+    LARGE_TARGET: ClassVar[str] = '<android.widget.Button resource-id="com.example.app:id/target_button" text="Target" />'
+    LARGE_PAGE_SOURCE: ClassVar[str] = LARGE_PREFIX + LARGE_TARGET + '</android.widget.FrameLayout></hierarchy>'
+
     def setUp(self):
         """Set up the test environment."""
         # Mock context manager
@@ -28,19 +34,18 @@ class TestAndroidCheckerAgent(unittest.TestCase):
         
         # Create a mock LLM client
         self.mock_llm = MagicMock()
-        self.mock_llm.generate_response = MagicMock()
         
         # Mock response object
         mock_response = MagicMock()
         mock_response.content = '{"resource-id": "com.example.app:id/login_button"}'
-        self.mock_llm.generate_response.return_value = mock_response
+        self.mock_llm.generate_response = AsyncMock(return_value=mock_response)
         
         # Create the agent with the mock LLM
         with patch('agents.base_agent.BaseAgent._init_llm'):
             self.agent = CheckerAgent("TestCheckerAgent", self.llm_config, self.context_manager)
             self.agent.llm = self.mock_llm
     
-    def test_android_resource_id_matching(self):
+    async def test_android_resource_id_matching(self):
         """Test matching Android resource IDs."""
         # Android page source with resource IDs
         page_source = '''
@@ -65,23 +70,269 @@ class TestAndroidCheckerAgent(unittest.TestCase):
             ("register", "com.example.app:id/register_link")
         ]
         
-        for input_id, expected_id in test_cases:
-            # Test input
-            input_data = {
+        # Answer each request with the expected ID for the element it asks about
+        async def respond(messages):
+            prompt = messages[-1]["content"]
+            for input_id, expected_id in test_cases:
+                if f"identifier: '{input_id}'" in prompt:
+                    mock_response = MagicMock()
+                    mock_response.content = f'{{"resource-id": "{expected_id}"}}'
+                    return mock_response
+        
+        self.mock_llm.generate_response.side_effect = respond
+        
+        # Test inputs
+        inputs = [
+            {
                 "missing_element": input_id,
                 "error_message": f"Element not found: {input_id}",
                 "page_source": page_source
             }
-            
-            # Run the agent
-            result = asyncio.run(self.agent.execute(input_data))
-            
+            for input_id, _ in test_cases
+        ]
+        
+        # Run the agent on all inputs concurrently
+        results = await asyncio.gather(*(self.agent.execute(input_data) for input_data in inputs))
+        
+        for (input_id, expected_id), result in zip(test_cases, results):
             # Check result
             self.assertIn("resource-id", result, f"Failed to find resource-id for {input_id}")
             self.assertEqual(result["resource-id"], expected_id, 
                             f"Expected {expected_id} but got {result.get('resource-id')}")
     
-    def test_android_text_matching(self):
+    async def test_android_batched_execute(self):
+        """Test that a list of inputs is answered through one batched LLM call."""
+        page_source = '''
+        <hierarchy>
+          <android.widget.LinearLayout resource-id="com.example.app:id/container">
+            <android.widget.EditText resource-id="com.example.app:id/username" hint="Enter username" />
+            <android.widget.Button resource-id="com.example.app:id/login_button" text="Sign In" />
+          </android.widget.LinearLayout>
+        </hierarchy>
+        '''
+        
+        # The batched response answers each numbered request in turn
+        mock_response = MagicMock()
+        mock_response.content = (
+            '[1] {"resource-id": "com.example.app:id/username"}\n'
+            '[2] {"resource-id": "com.example.app:id/login_button"}'
+        )
+        self.mock_llm.generate_response.return_value = mock_response
+        
+        inputs = [
+            {
+                "missing_element": input_id,
+                "error_message": f"Element not found: {input_id}",
+                "page_source": page_source
+            }
+            for input_id in ("username_field", "login_btn")
+        ]
+        
+        results = await self.agent.execute(inputs)
+        
+        self.assertEqual(
+            [result.get("resource-id") for result in results],
+            ["com.example.app:id/username", "com.example.app:id/login_button"]
+        )
+        self.assertEqual(self.mock_llm.generate_response.await_count, 1)
+    
+    async def test_mixed_platform_batch(self):
+        """Test that the platform and retry of one batched input do not leak into the others."""
+        android_page = '<hierarchy><android.widget.Button resource-id="com.example.app:id/login_button" text="Sign In" /></hierarchy>'
+        ios_page = '<AppiumAUT><XCUIElementTypeButton name="loginButton" label="Log In" /></AppiumAUT>'
+        
+        # Answer each prompt for the platform named in its system message
+        async def respond(messages):
+            response = MagicMock()
+            if "IOS" in messages[0]["content"]:
+                response.content = '{"name": "loginButton"}'
+            else:
+                response.content = '{"resource-id": "com.example.app:id/login_button"}'
+            return response
+        self.mock_llm.generate_response.side_effect = respond
+        
+        results = await self.agent.execute([
+            {
+                "missing_element": "login_btn",
+                "error_message": "Element not found: login_btn",
+                "page_source": ios_page,
+                "platform": "ios",
+                "retry_count": 1
+            },
+            {
+                "missing_element": "com.example.app:id/login_button",
+                "error_message": "Element not found: com.example.app:id/login_button",
+                "page_source": android_page,
+                "platform": "android"
+            }
+        ])
+        
+        self.assertEqual(results, [
+            {"name": "loginButton"},
+            {"resource-id": "com.example.app:id/login_button"}
+        ])
+        # Only the retried iOS input needed the LLM
+        self.assertEqual(self.mock_llm.generate_response.await_count, 1)
+        self.assertEqual(self.agent.platform, "android")
+    
+    async def test_android_exact_match_skips_llm(self):
+        """Test that an exact attribute match is resolved without the LLM."""
+        page_source = '''
+        <hierarchy>
+          <android.widget.LinearLayout resource-id="com.example.app:id/container">
+            <android.widget.Button resource-id="com.example.app:id/login_button" text="Sign In" />
+          </android.widget.LinearLayout>
+        </hierarchy>
+        '''
+        
+        input_data = {
+            "missing_element": "Sign In",
+            "error_message": "Element not found: Sign In",
+            "page_source": page_source
+        }
+        
+        result = await self.agent.execute(input_data)
+        
+        self.assertEqual(result, {"text": "Sign In"})
+        self.mock_llm.generate_response.assert_not_awaited()
+    
+    def test_exact_match_skips_duplicate_values(self):
+        """Test that a value shared by several elements is not an exact match."""
+        page_source = '''
+        <hierarchy>
+          <android.widget.LinearLayout>
+            <android.widget.Button resource-id="com.example.app:id/confirm" text="OK" />
+            <android.widget.Button resource-id="com.example.app:id/dismiss" text="OK" />
+          </android.widget.LinearLayout>
+        </hierarchy>
+        '''
+        
+        self.assertIsNone(self.agent._find_exact_match("OK", page_source))
+        self.assertEqual(
+            self.agent._find_exact_match("com.example.app:id/confirm", page_source),
+            {"resource-id": "com.example.app:id/confirm"}
+        )
+    
+    async def test_suggestion_reused_for_same_page(self):
+        """Test that a suggestion is reused for the same element on the same page."""
+        page_source = '<hierarchy><android.widget.Button resource-id="com.example.app:id/login_button" /></hierarchy>'
+        input_data = {
+            "missing_element": "login_btn",
+            "error_message": "Element not found: login_btn",
+            "page_source": page_source
+        }
+        
+        self.agent.force_llm_usage = True
+        first = await self.agent.execute(input_data)
+        second = await self.agent.execute(input_data)
+        
+        self.assertEqual(first, {"resource-id": "com.example.app:id/login_button"})
+        self.assertEqual(second, first)
+        self.assertEqual(self.mock_llm.generate_response.await_count, 1)
+    
+    async def test_suggestion_not_reused_across_platforms(self):
+        """Test that a suggestion cached for Android is not served for iOS."""
+        page_source = '<hierarchy><android.widget.Button resource-id="com.example.app:id/login_button" /></hierarchy>'
+        input_data = {
+            "missing_element": "login_btn",
+            "error_message": "Element not found: login_btn",
+            "page_source": page_source
+        }
+        
+        self.agent.force_llm_usage = True
+        await self.agent.execute({**input_data, "platform": "android"})
+        await self.agent.execute({**input_data, "platform": "android"})
+        await self.agent.execute({**input_data, "platform": "ios"})
+        
+        self.assertEqual(self.mock_llm.generate_response.await_count, 2)
+    
+    async def test_failed_suggestion_not_reused(self):
+        """Test that a cached suggestion reported as failed is not served again."""
+        page_source = '<hierarchy><android.widget.Button resource-id="com.example.app:id/login_button" /></hierarchy>'
+        input_data = {
+            "missing_element": "login_btn",
+            "error_message": "Element not found: login_btn",
+            "page_source": page_source
+        }
+        
+        self.agent.force_llm_usage = True
+        first = await self.agent.execute(input_data)
+        await self.agent.execute({**input_data, "failed_suggestions": [first]})
+        
+        self.assertGreater(self.mock_llm.generate_response.await_count, 1)
+    
+    async def test_full_page_used_when_no_element_matches(self):
+        """Test that the full page is sent when no element matches the search terms."""
+        page_source = '''
+        <hierarchy>
+          <android.widget.LinearLayout>
+            <android.widget.TextView text="Welcome" />
+          </android.widget.LinearLayout>
+        </hierarchy>
+        '''
+        input_data = {
+            "missing_element": "login_btn",
+            "error_message": "Element not found: login_btn",
+            "page_source": page_source
+        }
+        
+        full_page = AsyncMock(return_value={"text": "Welcome"})
+        with patch.object(self.agent, '_get_llm_multi_window_suggestion', AsyncMock(return_value=None)) as multi_window, \
+                patch.object(self.agent, '_get_llm_suggestion_with_full_page', full_page):
+            result = await self.agent.execute(input_data)
+        
+        self.assertEqual(result, {"text": "Welcome"})
+        # Only the first round ran, no best-effort windows were extracted
+        self.assertEqual(multi_window.await_count, 1)
+        full_page.assert_awaited_once()
+    
+    async def test_android_high_confidence_match_skips_llm(self):
+        """Test that a high-confidence window match is used without the LLM."""
+        page_source = '''
+        <hierarchy>
+          <android.widget.LinearLayout>
+            <android.widget.Button text="Login" resource-id="com.example.app:id/login" />
+            <android.widget.TextView text="Forgot password?" clickable="true" />
+          </android.widget.LinearLayout>
+        </hierarchy>
+        '''
+        
+        input_data = {
+            "missing_element": "login",
+            "error_message": "Element not found: login",
+            "page_source": page_source
+        }
+        
+        result = await self.agent.execute(input_data)
+        
+        self.assertEqual(result, {"resource-id": "com.example.app:id/login"})
+        self.mock_llm.generate_response.assert_not_awaited()
+    
+    async def test_generic_button_not_picked_without_llm(self):
+        """Test that a clickable button is not used directly just for being a button."""
+        page_source = '''
+        <hierarchy>
+          <android.widget.LinearLayout>
+            <android.widget.Button resource-id="com.example.app:id/cancel_button" text="Cancel" clickable="true" />
+            <android.widget.Button resource-id="com.example.app:id/login_button" text="Sign In" clickable="true" />
+          </android.widget.LinearLayout>
+        </hierarchy>
+        '''
+        
+        for missing_element in ("submit button", "login_button_x"):
+            with self.subTest(missing_element=missing_element):
+                self.mock_llm.generate_response.reset_mock()
+                
+                result = await self.agent.execute({
+                    "missing_element": missing_element,
+                    "error_message": f"Element not found: {missing_element}",
+                    "page_source": page_source
+                })
+                
+                self.assertNotEqual(result, {"resource-id": "com.example.app:id/cancel_button"})
+                self.mock_llm.generate_response.assert_awaited()
+    
+    async def test_android_text_matching(self):
         """Test matching Android elements by text."""
         # Android page source with text attributes
         page_source = '''
@@ -110,13 +361,13 @@ class TestAndroidCheckerAgent(unittest.TestCase):
         }
         
         # Run the agent
-        result = asyncio.run(self.agent.execute(input_data))
+        result = await self.agent.execute(input_data)
         
         # Check result
         self.assertIn("text", result)
         self.assertEqual(result["text"], "Continue to App")
     
-    def test_android_content_desc_matching(self):
+    async def test_android_content_desc_matching(self):
         """Test matching Android elements by content-desc."""
         # Android page source with content-desc attributes
         page_source = '''
@@ -145,13 +396,13 @@ class TestAndroidCheckerAgent(unittest.TestCase):
         }
         
         # Run the agent
-        result = asyncio.run(self.agent.execute(input_data))
+        result = await self.agent.execute(input_data)
         
         # Check result
         self.assertIn("content-desc", result)
         self.assertEqual(result["content-desc"], "Add to favorites")
     
-    def test_android_ui_selector_generation(self):
+    async def test_android_ui_selector_generation(self):
         """Test generation of Android UI selectors."""
         # Android page source
         page_source = '''
@@ -170,6 +421,9 @@ class TestAndroidCheckerAgent(unittest.TestCase):
         mock_response.content = '{"ui-selector": "new UiSelector().text(\\"Login\\")"}'
         self.mock_llm.generate_response.return_value = mock_response
         
+        # Ask the LLM even though the page has a high-confidence match
+        self.agent.force_llm_usage = True
+        
         # Test input
         input_data = {
             "missing_element": "login",
@@ -178,13 +432,13 @@ class TestAndroidCheckerAgent(unittest.TestCase):
         }
         
         # Run the agent
-        result = asyncio.run(self.agent.execute(input_data))
+        result = await self.agent.execute(input_data)
         
         # Check result
         self.assertIn("ui-selector", result)
         self.assertEqual(result["ui-selector"], 'new UiSelector().text("Login")')
     
-    def test_android_xpath_generation(self):
+    async def test_android_xpath_generation(self):
         """Test generation of Android XPath expressions."""
         # Android page source
         page_source = '''
@@ -216,23 +470,18 @@ class TestAndroidCheckerAgent(unittest.TestCase):
         }
         
         # Run the agent
-        result = asyncio.run(self.agent.execute(input_data))
+        result = await self.agent.execute(input_data)
         
         # Check result
         self.assertIn("xpath", result)
         self.assertEqual(result["xpath"], "//android.widget.Button[@text='Save Changes']")
     
-    def test_large_android_page_source(self):
+    async def test_large_android_page_source(self):
         """Test with a large Android page source where the element is beyond 5000 characters."""
-        # Create a large Android page source with the target element at the end
-        prefix = '<hierarchy><android.widget.FrameLayout>' + '<android.view.View></android.view.View>' * 500
-        target = '<android.widget.Button resource-id="com.example.app:id/target_button" text="Target" />'
-        suffix = '</android.widget.FrameLayout></hierarchy>'
-        
-        page_source = prefix + target + suffix
+        page_source = self.LARGE_PAGE_SOURCE
         
         # Ensure the target element is beyond 5000 characters
-        self.assertGreater(len(prefix), 5000)
+        self.assertGreater(len(self.LARGE_PREFIX), 5000)
         
         # Override the LLM response for this test
         mock_response = MagicMock()
@@ -247,14 +496,65 @@ class TestAndroidCheckerAgent(unittest.TestCase):
         }
         
         # Run the agent
-        result = asyncio.run(self.agent.execute(input_data))
+        result = await self.agent.execute(input_data)
         
         # Check result
         # This should find the element even though it's beyond the 5000 character limit
         self.assertIn("resource-id", result)
         self.assertEqual(result["resource-id"], "com.example.app:id/target_button")
     
-    def test_android_complex_hierarchy(self):
+    def test_focus_page_source(self):
+        """Test that a large page source is reduced to the region around the best match."""
+        prefix = '<hierarchy><android.widget.FrameLayout>' + '<android.view.View text="Filler" />' * 800
+        target = '<android.widget.Button resource-id="com.example.app:id/target_button" text="Target" />'
+        suffix = '</android.widget.FrameLayout></hierarchy>'
+        
+        page_source = prefix + target + suffix
+        focused_source = self.agent._focus_page_source(page_source, "target_button")
+        
+        self.assertIn(target, focused_source)
+        self.assertLess(len(focused_source), len(page_source) // 4)
+    
+    async def test_full_page_prompt_describes_excerpts(self):
+        """Test that the full page prompt only claims completeness for a whole page."""
+        small_page = '<hierarchy><android.widget.Button text="Save" /></hierarchy>'
+        await self.agent._get_llm_suggestion_with_full_page("save", "Element not found: save", small_page)
+        small_prompt = self.mock_llm.generate_response.await_args.args[0][1]["content"]
+        
+        await self.agent._get_llm_suggestion_with_full_page("target", "Element not found: target", self.LARGE_PAGE_SOURCE)
+        large_prompt = self.mock_llm.generate_response.await_args.args[0][1]["content"]
+        
+        self.assertIn("COMPLETE page source", small_prompt)
+        self.assertNotIn("COMPLETE page source", large_prompt)
+        self.assertIn("EXCERPTS", large_prompt)
+    
+    async def test_find_from_screen_definitions(self):
+        """Test matching a search key against indexed screen identifiers."""
+        screen_def = {
+            "name": "Login",
+            "identifiers": [
+                {"description": 'the screen shows "Welcome back"', "content": "Welcome back"},
+                {"description": 'the screen has button "Sign In"', "content": "Sign In"},
+            ]
+        }
+        screens_registry = MagicMock()
+        screens_registry.get_screen.return_value = screen_def
+        screens_registry.get_all_screens.return_value = {"Login": screen_def}
+        self.context_manager.set("screens_registry", screens_registry)
+        self.context_manager.set("current_screen", "Login")
+        self.addCleanup(self.context_manager.delete, "screens_registry")
+        self.addCleanup(self.context_manager.delete, "current_screen")
+        
+        page_source = '<hierarchy><android.widget.Button text="Sign In" /></hierarchy>'
+        result = await self.agent._find_from_screen_definitions("signIn", page_source)
+        self.assertEqual(result, {"text": "Sign In"})
+        
+        # The index is built once and reused for later lookups
+        index = self.agent._screen_indexes["Login"]
+        await self.agent._find_from_screen_definitions("welcome_back", page_source)
+        self.assertIs(self.agent._screen_indexes["Login"], index)
+    
+    async def test_android_complex_hierarchy(self):
         """Test with a complex Android hierarchy with nested views."""
         # Complex Android hierarchy with deeply nested elements
         page_source = '''
@@ -298,12 +598,38 @@ class TestAndroidCheckerAgent(unittest.TestCase):
         }
         
         # Run the agent
-        result = asyncio.run(self.agent.execute(input_data))
+        result = await self.agent.execute(input_data)
         
         # Check result
         self.assertIn("resource-id", result)
         self.assertEqual(result["resource-id"], "com.example.app:id/buy_now")
     
+    def test_non_ascii_attribute_matching(self):
+        """Test that attribute matching lowercases non-ASCII values like the search terms."""
+        root = _parse_page('''
+        <hierarchy>
+          <android.widget.Button text="Войти" resource-id="com.example.app:id/sign_in" />
+          <android.widget.Button text="Отмена" resource-id="com.example.app:id/cancel" />
+        </hierarchy>
+        ''')
+        
+        matches = self.agent._find_elements_by_attribute_match(root, ["Войти"], ["text", "content-desc"])
+        
+        self.assertEqual([element.get("resource-id") for element in matches], ["com.example.app:id/sign_in"])
+    
+    def test_non_ascii_type_matching(self):
+        """Test that type matching lowercases non-ASCII values like the search terms."""
+        root = _parse_page('''
+        <hierarchy>
+          <android.widget.TextView text="Войти в аккаунт" resource-id="com.example.app:id/title" />
+          <android.widget.Button class="android.widget.Button" text="Войти" resource-id="com.example.app:id/sign_in" />
+        </hierarchy>
+        ''')
+        
+        matches = self.agent._find_elements_by_type(root, "button", ["Войти"])
+        
+        self.assertEqual([element.get("resource-id") for element in matches], ["com.example.app:id/sign_in"])
+    
     def test_android_extractors(self):
         """Test the Android-specific extractors."""
         # Android page source
@@ -333,6 +659,19 @@ class TestAndroidCheckerAgent(unittest.TestCase):
         selectors = self.agent._extract_android_ui_selectors(page_source)
         self.assertTrue(any('new UiSelector().text("Login")' in s for s in selectors))
         self.assertTrue(any('new UiSelector().resourceId("com.example.app:id/login")' in s for s in selectors))
+    
+    def test_validate_locator_complexity(self):
+        """Test that only XPaths with many conditions are simplified."""
+        # Words like android and selector are not counted as conditions
+        xpath = ("//android.widget.Button[contains(@resource-id, 'selector') "
+                 "and contains(@text, 'Order') or @clickable='true']")
+        locator = self.agent._validate_locator({"xpath": xpath})
+        self.assertEqual(locator, {"xpath": xpath})
+        
+        xpath = ("//android.widget.Button[contains(@text, 'Buy') and contains(@text, 'Now') "
+                 "or contains(@content-desc, 'Buy') or contains(@content-desc, 'Now')]")
+        locator = self.agent._validate_locator({"xpath": xpath})
+        self.assertEqual(locator, {"xpath": "//android.widget.Button[contains(@text, 'Buy')]"})
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,6 +1,7 @@
 import unittest
 import asyncio
-from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
 import sys
 import os
 
@@ -10,52 +11,175 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from agents.checker_agent import CheckerAgent
 from core.context_manager import ContextManager
 
-class TestIOSCheckerAgent(unittest.TestCase):
+class TestIOSCheckerAgent(unittest.IsolatedAsyncioTestCase):
     """Test the enhanced CheckerAgent with iOS page sources."""
 
-    def setUp(self):
-        """Set up the test environment."""
+    @classmethod
+    def setUpClass(cls):
+        """Set up the agent and its mock LLM once for all tests."""
         # Mock context manager
-        self.context_manager = ContextManager()
-        self.context_manager.set("platform", "ios")
+        cls.context_manager = ContextManager()
+        cls.context_manager.set("platform", "ios")
         
         # Mock LLM configuration
-        self.llm_config = {
+        cls.llm_config = {
             "model": "test-model",
             "temperature": 0.1
         }
         
-        # Create a mock LLM client
-        self.mock_llm = MagicMock()
-        self.mock_llm.generate_response = MagicMock()
-        
-        # Mock response object
-        mock_response = MagicMock()
-        mock_response.content = '{"name": "loginButton"}'
-        self.mock_llm.generate_response.return_value = mock_response
+        # Create a mock LLM client whose generate_response is awaitable
+        cls.mock_llm = AsyncMock()
         
         # Create the agent with the mock LLM
         with patch('agents.base_agent.BaseAgent._init_llm'):
-            self.agent = CheckerAgent("TestCheckerAgent", self.llm_config, self.context_manager)
-            self.agent.llm = self.mock_llm
+            cls.agent = CheckerAgent("TestCheckerAgent", cls.llm_config, cls.context_manager)
+            cls.agent.llm = cls.mock_llm
+        
+        # Large page source with the target element beyond 5000 characters
+        cls._LARGE_PREFIX = ''.join(
+            ['<AppiumAUT><XCUIElementTypeApplication>'] +
+            ['<XCUIElementTypeOther></XCUIElementTypeOther>'] * 500
+        )
+        
+        # Page sources shared by the tests, built once per class
+        cls.page_sources = {
+            # iOS page source with name attributes
+            "name_match": '''
+            <AppiumAUT>
+              <XCUIElementTypeApplication name="ExampleApp">
+                <XCUIElementTypeWindow>
+                  <XCUIElementTypeOther>
+                    <XCUIElementTypeTextField name="usernameField" label="Username" value="" />
+                    <XCUIElementTypeSecureTextField name="passwordField" label="Password" value="" />
+                    <XCUIElementTypeButton name="loginButton" label="Sign In" />
+                    <XCUIElementTypeStaticText name="registerLink" label="Create an account" />
+                  </XCUIElementTypeOther>
+                </XCUIElementTypeWindow>
+              </XCUIElementTypeApplication>
+            </AppiumAUT>
+            ''',
+            # iOS page source with label attributes
+            "label_match": '''
+            <AppiumAUT>
+              <XCUIElementTypeApplication>
+                <XCUIElementTypeWindow>
+                  <XCUIElementTypeOther>
+                    <XCUIElementTypeStaticText label="Welcome to Example App" />
+                    <XCUIElementTypeButton label="Continue to App" />
+                    <XCUIElementTypeButton label="Settings" />
+                    <XCUIElementTypeStaticText label="Version 1.0.0" />
+                  </XCUIElementTypeOther>
+                </XCUIElementTypeWindow>
+              </XCUIElementTypeApplication>
+            </AppiumAUT>
+            ''',
+            # iOS page source with value attributes
+            "value_match": '''
+            <AppiumAUT>
+              <XCUIElementTypeApplication>
+                <XCUIElementTypeWindow>
+                  <XCUIElementTypeOther>
+                    <XCUIElementTypeTextField label="Search" value="iPhone 12" />
+                    <XCUIElementTypeSlider label="Volume" value="75%" />
+                    <XCUIElementTypeSwitch label="Enable notifications" value="1" />
+                  </XCUIElementTypeOther>
+                </XCUIElementTypeWindow>
+              </XCUIElementTypeApplication>
+            </AppiumAUT>
+            ''',
+            # iOS page source
+            "predicate": '''
+            <AppiumAUT>
+              <XCUIElementTypeApplication>
+                <XCUIElementTypeWindow>
+                  <XCUIElementTypeOther>
+                    <XCUIElementTypeButton label="Login" name="loginButton" />
+                    <XCUIElementTypeStaticText label="Forgot password?" />
+                  </XCUIElementTypeOther>
+                </XCUIElementTypeWindow>
+              </XCUIElementTypeApplication>
+            </AppiumAUT>
+            ''',
+            # iOS page source
+            "class_chain": '''
+            <AppiumAUT>
+              <XCUIElementTypeApplication>
+                <XCUIElementTypeWindow>
+                  <XCUIElementTypeOther>
+                    <XCUIElementTypeScrollView>
+                      <XCUIElementTypeOther>
+                        <XCUIElementTypeStaticText label="Profile Settings" />
+                        <XCUIElementTypeTextField label="Display Name" />
+                        <XCUIElementTypeButton label="Save Changes" />
+                      </XCUIElementTypeOther>
+                    </XCUIElementTypeScrollView>
+                  </XCUIElementTypeOther>
+                </XCUIElementTypeWindow>
+              </XCUIElementTypeApplication>
+            </AppiumAUT>
+            ''',
+            # Complex iOS hierarchy with deeply nested elements
+            "complex_hierarchy": '''
+            <AppiumAUT>
+              <XCUIElementTypeApplication name="ExampleApp">
+                <XCUIElementTypeWindow>
+                  <XCUIElementTypeNavigationBar name="ProductDetails">
+                    <XCUIElementTypeButton name="backButton" label="Back" />
+                    <XCUIElementTypeStaticText name="titleLabel" label="Product Details" />
+                  </XCUIElementTypeNavigationBar>
+                  <XCUIElementTypeScrollView>
+                    <XCUIElementTypeImage name="productImage" label="Product Image" />
+                    <XCUIElementTypeStaticText name="productTitle" label="Premium Smartphone" />
+                    <XCUIElementTypeStaticText name="productPrice" label="$999.99" />
+                    <XCUIElementTypeStaticText name="descriptionLabel" label="Product Description" />
+                    <XCUIElementTypeOther>
+                      <XCUIElementTypeStaticText name="descriptionText" label="High-resolution display, powerful processor, and advanced camera system." />
+                    </XCUIElementTypeOther>
+                    <XCUIElementTypeOther>
+                      <XCUIElementTypeButton name="addToCartButton" label="Add to Cart" />
+                      <XCUIElementTypeButton name="buyNowButton" label="Buy Now" />
+                    </XCUIElementTypeOther>
+                  </XCUIElementTypeScrollView>
+                </XCUIElementTypeWindow>
+              </XCUIElementTypeApplication>
+            </AppiumAUT>
+            ''',
+            # iOS page source
+            "extractors": '''
+            <AppiumAUT>
+              <XCUIElementTypeApplication>
+                <XCUIElementTypeWindow>
+                  <XCUIElementTypeOther>
+                    <XCUIElementTypeButton name="loginButton" label="Login" value="" />
+                  </XCUIElementTypeOther>
+                </XCUIElementTypeWindow>
+              </XCUIElementTypeApplication>
+            </AppiumAUT>
+            ''',
+            "large": ''.join([
+                cls._LARGE_PREFIX,
+                '<XCUIElementTypeButton name="targetButton" label="Target" />',
+                '</XCUIElementTypeApplication></AppiumAUT>'
+            ]),
+        }
     
-    def test_ios_name_matching(self):
+    def setUp(self):
+        """Set the default LLM response and reset shared state after each test."""
+        mock_response = SimpleNamespace(content='{"name": "loginButton"}')
+        self.mock_llm.generate_response.return_value = mock_response
+        self.addCleanup(self._reset_shared_state)
+    
+    def _reset_shared_state(self):
+        """Undo changes a test made to the shared agent and mock LLM."""
+        self.mock_llm.generate_response.reset_mock(return_value=True, side_effect=True)
+        self.agent.previous_suggestions.clear()
+        self.agent._suggestion_cache.clear()
+        self.agent.force_llm_usage = False
+        self.agent.platform = "ios"
+    
+    async def test_ios_name_matching(self):
         """Test matching iOS elements by name attribute."""
-        # iOS page source with name attributes
-        page_source = '''
-        <AppiumAUT>
-          <XCUIElementTypeApplication name="ExampleApp">
-            <XCUIElementTypeWindow>
-              <XCUIElementTypeOther>
-                <XCUIElementTypeTextField name="usernameField" label="Username" value="" />
-                <XCUIElementTypeSecureTextField name="passwordField" label="Password" value="" />
-                <XCUIElementTypeButton name="loginButton" label="Sign In" />
-                <XCUIElementTypeStaticText name="registerLink" label="Create an account" />
-              </XCUIElementTypeOther>
-            </XCUIElementTypeWindow>
-          </XCUIElementTypeApplication>
-        </AppiumAUT>
-        '''
+        page_source = self.page_sources["name_match"]
         
         # Test inputs with slightly different identifiers
         test_cases = [
@@ -64,48 +188,37 @@ class TestIOSCheckerAgent(unittest.TestCase):
             ("register", "registerLink")
         ]
         
-        for input_id, expected_id in test_cases:
-            # Override the LLM response for this test case
-            mock_response = MagicMock()
-            mock_response.content = f'{{"name": "{expected_id}"}}'
-            self.mock_llm.generate_response.return_value = mock_response
-            
-            # Test input
-            input_data = {
+        # Each concurrent lookup reaches the LLM in input order and gets its own response
+        self.mock_llm.generate_response.side_effect = [
+            SimpleNamespace(content=f'{{"name": "{expected_id}"}}')
+            for _, expected_id in test_cases
+        ]
+        
+        # Test inputs
+        inputs = [
+            {
                 "missing_element": input_id,
                 "error_message": f"Element not found: {input_id}",
                 "page_source": page_source
             }
-            
-            # Run the agent
-            result = asyncio.run(self.agent.execute(input_data))
-            
+            for input_id, _ in test_cases
+        ]
+        
+        # Run the agent on all inputs concurrently
+        results = await asyncio.gather(*(self.agent.execute(input_data) for input_data in inputs))
+        
+        for (input_id, expected_id), result in zip(test_cases, results):
             # Check result
             self.assertIn("name", result, f"Failed to find name for {input_id}")
             self.assertEqual(result["name"], expected_id, 
                             f"Expected {expected_id} but got {result.get('name')}")
     
-    def test_ios_label_matching(self):
+    async def test_ios_label_matching(self):
         """Test matching iOS elements by label attribute."""
-        # iOS page source with label attributes
-        page_source = '''
-        <AppiumAUT>
-          <XCUIElementTypeApplication>
-            <XCUIElementTypeWindow>
-              <XCUIElementTypeOther>
-                <XCUIElementTypeStaticText label="Welcome to Example App" />
-                <XCUIElementTypeButton label="Continue to App" />
-                <XCUIElementTypeButton label="Settings" />
-                <XCUIElementTypeStaticText label="Version 1.0.0" />
-              </XCUIElementTypeOther>
-            </XCUIElementTypeWindow>
-          </XCUIElementTypeApplication>
-        </AppiumAUT>
-        '''
+        page_source = self.page_sources["label_match"]
         
         # Override the LLM response for this test
-        mock_response = MagicMock()
-        mock_response.content = '{"label": "Continue to App"}'
+        mock_response = SimpleNamespace(content='{"label": "Continue to App"}')
         self.mock_llm.generate_response.return_value = mock_response
         
         # Test input
@@ -116,32 +229,18 @@ class TestIOSCheckerAgent(unittest.TestCase):
         }
         
         # Run the agent
-        result = asyncio.run(self.agent.execute(input_data))
+        result = await self.agent.execute(input_data)
         
         # Check result
         self.assertIn("label", result)
         self.assertEqual(result["label"], "Continue to App")
     
-    def test_ios_value_matching(self):
+    async def test_ios_value_matching(self):
         """Test matching iOS elements by value attribute."""
-        # iOS page source with value attributes
-        page_source = '''
-        <AppiumAUT>
-          <XCUIElementTypeApplication>
-            <XCUIElementTypeWindow>
-              <XCUIElementTypeOther>
-                <XCUIElementTypeTextField label="Search" value="iPhone 12" />
-                <XCUIElementTypeSlider label="Volume" value="75%" />
-                <XCUIElementTypeSwitch label="Enable notifications" value="1" />
-              </XCUIElementTypeOther>
-            </XCUIElementTypeWindow>
-          </XCUIElementTypeApplication>
-        </AppiumAUT>
-        '''
+        page_source = self.page_sources["value_match"]
         
         # Override the LLM response for this test
-        mock_response = MagicMock()
-        mock_response.content = '{"value": "iPhone 12"}'
+        mock_response = SimpleNamespace(content='{"value": "iPhone 12"}')
         self.mock_llm.generate_response.return_value = mock_response
         
         # Test input
@@ -152,33 +251,23 @@ class TestIOSCheckerAgent(unittest.TestCase):
         }
         
         # Run the agent
-        result = asyncio.run(self.agent.execute(input_data))
+        result = await self.agent.execute(input_data)
         
         # Check result
         self.assertIn("value", result)
         self.assertEqual(result["value"], "iPhone 12")
     
-    def test_ios_predicate_generation(self):
+    async def test_ios_predicate_generation(self):
         """Test generation of iOS predicates."""
-        # iOS page source
-        page_source = '''
-        <AppiumAUT>
-          <XCUIElementTypeApplication>
-            <XCUIElementTypeWindow>
-              <XCUIElementTypeOther>
-                <XCUIElementTypeButton label="Login" name="loginButton" />
-                <XCUIElementTypeStaticText label="Forgot password?" />
-              </XCUIElementTypeOther>
-            </XCUIElementTypeWindow>
-          </XCUIElementTypeApplication>
-        </AppiumAUT>
-        '''
+        page_source = self.page_sources["predicate"]
         
         # Override the LLM response for this test
-        mock_response = MagicMock()
-        mock_response.content = '{"predicate": "label == \\"Login\\""}'
+        mock_response = SimpleNamespace(content='{"predicate": "label == \\"Login\\""}')
         self.mock_llm.generate_response.return_value = mock_response
         
+        # Ask the LLM even though the page has a high-confidence match
+        self.agent.force_llm_usage = True
+        
         # Test input
         input_data = {
             "missing_element": "login",
@@ -187,36 +276,18 @@ class TestIOSCheckerAgent(unittest.TestCase):
         }
         
         # Run the agent
-        result = asyncio.run(self.agent.execute(input_data))
+        result = await self.agent.execute(input_data)
         
         # Check result
         self.assertIn("predicate", result)
         self.assertEqual(result["predicate"], 'label == "Login"')
     
-    def test_ios_class_chain_generation(self):
+    async def test_ios_class_chain_generation(self):
         """Test generation of iOS class chains."""
-        # iOS page source
-        page_source = '''
-        <AppiumAUT>
-          <XCUIElementTypeApplication>
-            <XCUIElementTypeWindow>
-              <XCUIElementTypeOther>
-                <XCUIElementTypeScrollView>
-                  <XCUIElementTypeOther>
-                    <XCUIElementTypeStaticText label="Profile Settings" />
-                    <XCUIElementTypeTextField label="Display Name" />
-                    <XCUIElementTypeButton label="Save Changes" />
-                  </XCUIElementTypeOther>
-                </XCUIElementTypeScrollView>
-              </XCUIElementTypeOther>
-            </XCUIElementTypeWindow>
-          </XCUIElementTypeApplication>
-        </AppiumAUT>
-        '''
+        page_source = self.page_sources["class_chain"]
         
         # Override the LLM response for this test
-        mock_response = MagicMock()
-        mock_response.content = '{"class-chain": "**/XCUIElementTypeButton[`label == \\"Save Changes\\"`]"}'
+        mock_response = SimpleNamespace(content='{"class-chain": "**/XCUIElementTypeButton[`label == \\"Save Changes\\"`]"}')
         self.mock_llm.generate_response.return_value = mock_response
         
         # Test input
@@ -227,27 +298,21 @@ class TestIOSCheckerAgent(unittest.TestCase):
         }
         
         # Run the agent
-        result = asyncio.run(self.agent.execute(input_data))
+        result = await self.agent.execute(input_data)
         
         # Check result
         self.assertIn("class-chain", result)
         self.assertEqual(result["class-chain"], '**/XCUIElementTypeButton[`label == "Save Changes"`]')
     
-    def test_large_ios_page_source(self):
+    async def test_large_ios_page_source(self):
         """Test with a large iOS page source where the element is beyond 5000 characters."""
-        # Create a large iOS page source with the target element at the end
-        prefix = '<AppiumAUT><XCUIElementTypeApplication>' + '<XCUIElementTypeOther></XCUIElementTypeOther>' * 500
-        target = '<XCUIElementTypeButton name="targetButton" label="Target" />'
-        suffix = '</XCUIElementTypeApplication></AppiumAUT>'
-        
-        page_source = prefix + target + suffix
+        page_source = self.page_sources["large"]
         
         # Ensure the target element is beyond 5000 characters
-        self.assertGreater(len(prefix), 5000)
+        self.assertGreater(len(self._LARGE_PREFIX), 5000)
         
         # Override the LLM response for this test
-        mock_response = MagicMock()
-        mock_response.content = '{"name": "targetButton"}'
+        mock_response = SimpleNamespace(content='{"name": "targetButton"}')
         self.mock_llm.generate_response.return_value = mock_response
         
         # Test input
@@ -258,45 +323,19 @@ class TestIOSCheckerAgent(unittest.TestCase):
         }
         
         # Run the agent
-        result = asyncio.run(self.agent.execute(input_data))
+        result = await self.agent.execute(input_data)
         
         # Check result
         # This should find the element even though it's beyond the 5000 character limit
         self.assertIn("name", result)
         self.assertEqual(result["name"], "targetButton")
     
-    def test_ios_complex_hierarchy(self):
+    async def test_ios_complex_hierarchy(self):
         """Test with a complex iOS hierarchy with nested views."""
-        # Complex iOS hierarchy with deeply nested elements
-        page_source = '''
-        <AppiumAUT>
-          <XCUIElementTypeApplication name="ExampleApp">
-            <XCUIElementTypeWindow>
-              <XCUIElementTypeNavigationBar name="ProductDetails">
-                <XCUIElementTypeButton name="backButton" label="Back" />
-                <XCUIElementTypeStaticText name="titleLabel" label="Product Details" />
-              </XCUIElementTypeNavigationBar>
-              <XCUIElementTypeScrollView>
-                <XCUIElementTypeImage name="productImage" label="Product Image" />
-                <XCUIElementTypeStaticText name="productTitle" label="Premium Smartphone" />
-                <XCUIElementTypeStaticText name="productPrice" label="$999.99" />
-                <XCUIElementTypeStaticText name="descriptionLabel" label="Product Description" />
-                <XCUIElementTypeOther>
-                  <XCUIElementTypeStaticText name="descriptionText" label="High-resolution display, powerful processor, and advanced camera system." />
-                </XCUIElementTypeOther>
-                <XCUIElementTypeOther>
-                  <XCUIElementTypeButton name="addToCartButton" label="Add to Cart" />
-                  <XCUIElementTypeButton name="buyNowButton" label="Buy Now" />
-                </XCUIElementTypeOther>
-              </XCUIElementTypeScrollView>
-            </XCUIElementTypeWindow>
-          </XCUIElementTypeApplication>
-        </AppiumAUT>
-        '''
+        page_source = self.page_sources["complex_hierarchy"]
         
         # Override the LLM response for this test
-        mock_response = MagicMock()
-        mock_response.content = '{"name": "buyNowButton"}'
+        mock_response = SimpleNamespace(content='{"name": "buyNowButton"}')
         self.mock_llm.generate_response.return_value = mock_response
         
         # Test input
@@ -307,7 +346,7 @@ class TestIOSCheckerAgent(unittest.TestCase):
         }
         
         # Run the agent
-        result = asyncio.run(self.agent.execute(input_data))
+        result = await self.agent.execute(input_data)
         
         # Check result
         self.assertIn("name", result)
@@ -315,18 +354,7 @@ class TestIOSCheckerAgent(unittest.TestCase):
     
     def test_ios_extractors(self):
         """Test the iOS-specific extractors."""
-        # iOS page source
-        page_source = '''
-        <AppiumAUT>
-          <XCUIElementTypeApplication>
-            <XCUIElementTypeWindow>
-              <XCUIElementTypeOther>
-                <XCUIElementTypeButton name="loginButton" label="Login" value="" />
-              </XCUIElementTypeOther>
-            </XCUIElementTypeWindow>
-          </XCUIElementTypeApplication>
-        </AppiumAUT>
-        '''
+        page_source = self.page_sources["extractors"]
         
         # Extract names
         names = self.agent._extract_names(page_source)
@@ -349,6 +377,22 @@ class TestIOSCheckerAgent(unittest.TestCase):
         class_chains = self.agent._extract_ios_class_chains(page_source)
         expected_chain = '**/XCUIElementTypeButton[`name == "loginButton"`]'
         self.assertTrue(any(expected_chain in c for c in class_chains))
+    
+    def test_ios_locator_from_text(self):
+        """Test extraction of iOS locators from free-form LLM responses."""
+        # Name wins over any other key, wherever it appears
+        locator = self.agent._extract_locator_from_text('label: "Login", xpath: "//x", name: "loginButton"')
+        self.assertEqual(locator, {"name": "loginButton"})
+        
+        # Otherwise label is preferred over xpath
+        locator = self.agent._extract_locator_from_text('"xpath": "//x", "label": "Login"')
+        self.assertEqual(locator, {"label": "Login"})
+        
+        # A key starting at the quote that closes another key's value is still found
+        locator = self.agent._extract_locator_from_text("predicate: 'name: 'loginButton'")
+        self.assertEqual(locator, {"name": "loginButton"})
+        
+        self.assertIsNone(self.agent._extract_locator_from_text("No locator here"))
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
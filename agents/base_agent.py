@@ -2,7 +2,9 @@
 Base Agent: Foundation class for all specialized agents in the testing framework.
 """
 
-from typing import Dict, Any, List, Union
+import asyncio
+import re
+from typing import Dict, Any, List, Optional, Union
 
 from core.context_manager import ContextManager
 from core.error_handler import handle_error
@@ -12,6 +14,18 @@ from utils.logger import get_logger
 # Configure logger
 logger = get_logger(__name__)
 
+# Parent of the per-agent loggers, which are named agent.<agent name>
+_agent_logger = get_logger("agent")
+
+# Marks the start of each numbered answer in a batched LLM response
+_BATCH_INDEX_RE = re.compile(r'^\[(\d+)\]\s*', re.M)
+
+_BATCH_INSTRUCTIONS = (
+    "Answer each of the following numbered requests independently. "
+    "Start each answer on a new line with the request's number in square brackets, "
+    "e.g. [1], followed by the answer in the format that request asks for.\n\n"
+)
+
 class BaseAgent:
     """
     Base class for all agents in the system, providing common functionality
@@ -35,8 +49,13 @@ class BaseAgent:
         self.name = name
         self.llm_config = llm_config
         self.context_manager = context_manager
-        self.logger = get_logger(f"agent.{name}")
+        self.logger = _agent_logger.getChild(name)
         self.llm = None
+        # System message for string prompts, built once; LLM clients do not mutate messages
+        self._system_message = {
+            "role": "system",
+            "content": f"You are the {name}, an AI assistant for mobile app testing."
+        }
         
         # Initialize LLM
         self._init_llm()
@@ -47,6 +66,7 @@ class BaseAgent:
             # Import dynamically to avoid circular imports
             from LLM.llm_client import create_llm_client
             
+            # Agents sharing a provider configuration get the same pooled client
             self.llm = create_llm_client(self.llm_config)
             self.logger.debug(f"Initialized LLM for agent: {self.name}")
         except Exception as e:
@@ -68,7 +88,8 @@ class BaseAgent:
     
     async def generate_response(self, prompt: Union[str, List[Dict[str, str]]]) -> str:
         """
-        Generate a response from the LLM.
+        Generate a response from the LLM. Repeated message lists are served
+        from the LLM client's response cache.
         
         Args:
             prompt: Prompt for the LLM (either a string or a list of message objects)
@@ -83,10 +104,7 @@ class BaseAgent:
         try:
             # Convert string prompt to message format if needed
             if isinstance(prompt, str):
-                messages = [
-                    {"role": "system", "content": f"You are the {self.name}, an AI assistant for mobile app testing."},
-                    {"role": "user", "content": prompt}
-                ]
+                messages = [self._system_message, {"role": "user", "content": prompt}]
             else:
                 messages = prompt
                 
@@ -99,6 +117,75 @@ class BaseAgent:
             self.logger.error(error_details["message"])
             return ""
     
+    async def generate_responses_batch(
+        self,
+        prompts: List[str],
+        batch_size: int = 8,
+        system_message: Optional[str] = None
+    ) -> List[str]:
+        """
+        Generate responses for several prompts, packing up to batch_size
+        prompts into each LLM call so the system prompt is sent once per batch.
+        
+        Args:
+            prompts: Prompts for the LLM
+            batch_size: Maximum number of prompts per LLM call
+            system_message: System message for the batch (defaults to the agent's)
+            
+        Returns:
+            LLM responses, in the same order as the prompts
+        """
+        if not self.llm:
+            self.logger.warning(f"LLM not initialized for agent: {self.name}")
+            return [""] * len(prompts)
+        
+        if system_message is None:
+            system_message = self._system_message["content"]
+        
+        batches = [prompts[i:i + batch_size] for i in range(0, len(prompts), batch_size)]
+        results = await asyncio.gather(*(self._generate_batch(batch, system_message) for batch in batches))
+        return [response for batch_responses in results for response in batch_responses]
+    
+    async def _generate_batch(self, prompts: List[str], system_message: str) -> List[str]:
+        """
+        Generate responses for one batch of prompts in a single LLM call.
+        Prompts whose answers are missing from the batched response are
+        retried individually.
+        
+        Args:
+            prompts: Prompts for the LLM
+            system_message: System message for the batch
+            
+        Returns:
+            LLM responses, in the same order as the prompts
+        """
+        def as_messages(content: str) -> List[Dict[str, str]]:
+            return [
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": content}
+            ]
+        
+        if len(prompts) == 1:
+            return [await self.generate_response(as_messages(prompts[0]))]
+        
+        numbered = "\n".join(f"[{index}] {prompt}" for index, prompt in enumerate(prompts, 1))
+        response = await self.generate_response(as_messages(_BATCH_INSTRUCTIONS + numbered))
+        
+        # Split the response into answers at each [index] marker
+        answers = {}
+        markers = list(_BATCH_INDEX_RE.finditer(response))
+        for marker, next_marker in zip(markers, markers[1:] + [None]):
+            end = next_marker.start() if next_marker else len(response)
+            answers[int(marker.group(1))] = response[marker.end():end].strip()
+        
+        missing = [index for index in range(1, len(prompts) + 1) if not answers.get(index)]
+        if missing:
+            self.logger.warning(f"Batched response missing {len(missing)} of {len(prompts)} answers, retrying them individually")
+            retried = await asyncio.gather(*(self.generate_response(as_messages(prompts[index - 1])) for index in missing))
+            answers.update(zip(missing, retried))
+        
+        return [answers[index] for index in range(1, len(prompts) + 1)]
+    
     def get_context(self, key: str, default: Any = None) -> Any:
         """
         Get a value from the shared context.
@@ -6,9 +6,20 @@ locators for elements that could not be found with standard approaches.
 Now enhanced with screen definition awareness and network monitoring.
 """
 
+import asyncio
+import contextvars
+import copy
+import hashlib
+import heapq
 import re
+import weakref
 import xml.etree.ElementTree as ET
-from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from functools import lru_cache
+from itertools import islice
+from io import BytesIO
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
 
 from agents.base_agent import BaseAgent
 from core.context_manager import ContextManager
@@ -18,9 +29,765 @@ from utils.logger import get_logger
 from utils.extract_json import extract_json
 from utils.network_monitor import NetworkMonitor
 
+try:
+    from lxml import etree as lxml_etree
+    has_lxml = True
+except ImportError:
+    has_lxml = False
+
+try:
+    from rapidfuzz import fuzz, process
+    has_rapidfuzz = True
+except ImportError:
+    has_rapidfuzz = False
+
+try:
+    import ahocorasick
+    has_ahocorasick = True
+except ImportError:
+    has_ahocorasick = False
+
+try:
+    import numpy as np
+    from numba import njit
+    has_numba = True
+except ImportError:
+    has_numba = False
+
+try:
+    import xxhash
+    has_xxhash = True
+except ImportError:
+    has_xxhash = False
+
+try:
+    import stringzilla
+    has_stringzilla = True
+except ImportError:
+    has_stringzilla = False
+
+# Use orjson's native parser for LLM responses if available
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
 # Configure logger
 logger = get_logger(__name__)
 
+# Attribute patterns used when a page source cannot be parsed as XML
+_RESOURCE_ID_RE = re.compile(r'resource-id="([^"]+)"')
+_TEXT_RE = re.compile(r'(?<![\w-])text="([^"]+)"')
+_CONTENT_DESC_RE = re.compile(r'content-desc="([^"]+)"')
+_NAME_RE = re.compile(r'(?<![\w-])name="([^"]+)"')
+_LABEL_RE = re.compile(r'(?<![\w-])label="([^"]+)"')
+_VALUE_RE = re.compile(r'(?<![\w-])value="([^"]+)"')
+_IOS_ELEMENT_RE = re.compile(r'<(XCUIElementType\w+)\b([^>]*)>')
+
+# Empty identifying attributes and attribute-less empty containers carry no
+# information for locating elements, so they are dropped before analysis
+_EMPTY_ATTRIBUTE_RE = re.compile(r'\s(?:name|label|value|text|content-desc|resource-id)=""')
+_EMPTY_CONTAINER_RE = re.compile(r'<XCUIElementTypeOther\s*(?:/>|>\s*</XCUIElementTypeOther>)')
+
+# Identifying attributes of both platforms, capturing the attribute name and value
+_ATTRIBUTE_VALUE_RE = re.compile(r'(?<![\w-])(resource-id|text|content-desc|name|label|value)="([^"]+)"')
+
+# Search term extraction and identifier tokenization
+_XPATH_CONTAINS_RE = re.compile(r"contains\([^,]+,\s*['\"]([^'\"]+)['\"]\)")
+_XPATH_EQ_RE = re.compile(r"@\w+\s*=\s*['\"]([^'\"]+)['\"]\]")
+_QUOTED_RE = re.compile(r"['\"]([^'\"]+)['\"]")
+_ALNUM_RE = re.compile(r'[a-zA-Z0-9]+')
+_CAMEL_RE = re.compile(r'([a-z])([A-Z])')
+_SPLIT_RE = re.compile(r'[^a-zA-Z0-9]+')
+
+# First element of a page source, used to find its root tag
+_ROOT_RE = re.compile(r'<(\w+)[^>]*>')
+
+# Opening, closing and self-closing tags, used to balance fallback windows
+_TAG_RE = re.compile(r'<(/?)([A-Za-z_][\w\-:.]*)[^>]*?(/?)>')
+
+# Identifying attributes searched for terms by the fallback windows, in order of preference
+_ANDROID_FALLBACK_ATTRIBUTES = ("resource-id", "text", "content-desc")
+_IOS_FALLBACK_ATTRIBUTES = ("name", "label", "value")
+_ANDROID_FALLBACK_RE = re.compile(r'(resource-id|text|content-desc)="([^"]*)"')
+_IOS_FALLBACK_RE = re.compile(r'(name|label|value)="([^"]*)"')
+
+# Term-independent fallback window patterns
+_ANDROID_BUTTON_RE = re.compile(r'class="[^"]*Button[^"]*"[^>]*text="[^"]*"')
+_ANDROID_CLICKABLE_RE = re.compile(r'clickable="true"')
+_IOS_BUTTON_RE = re.compile(r'type="[^"]*Button[^"]*"')
+
+# Locators stated as key: "value" in LLM responses, in order of preference.
+# Platforms other than Android are treated as iOS
+_LOCATOR_PATTERNS = {
+    platform: tuple(
+        (re.compile(key + r'["\']?\s*:\s*["\']([^"\']+)["\']'), key)
+        for key in keys
+    )
+    for platform, keys in (
+        ("android", ("resource-id", "text", "content-desc", "xpath")),
+        ("ios", ("name", "label", "value", "xpath")),
+    )
+}
+
+# First slash-free contains() term, used to simplify recursive XPaths
+_CONTAINS_TERM_RE = re.compile(r"contains\(@\w+,\s*'([^/]+)'\)")
+
+# Conditions of an XPath: contains() calls and the and/or operators joining
+# them, as whole words so that names like android or selector do not count
+_COMPLEXITY_RE = re.compile(r"contains|\band\b|\bor\b")
+
+# Element type and first contains() term of an XPath being simplified
+_ELEMENT_TYPE_RE = re.compile(r'//([^/\[\]]+)')
+_SEARCH_TERM_RE = re.compile(r"contains\(@\w+,\s*'([^']+)'\)")
+
+# Single-condition XPath that simplified locators are rebuilt as, with the
+# default element type and the attribute searched on each platform.
+# Platforms other than Android are treated as iOS
+_SIMPLE_XPATH_TEMPLATE = "//{element_type}[contains(@{attribute}, '{term}')]"
+_SIMPLE_XPATH_PARTS = {
+    "android": ("android.widget.Button", "text"),
+    "ios": ("XCUIElementTypeButton", "name"),
+}
+
+# XPath syntax characters removed from text locators
+_XPATH_STRIP_TABLE = str.maketrans("", "", "/[]@=")
+
+# Keywords hinting at the type of element a search key refers to, in order of precedence
+_ELEMENT_TYPE_KEYWORDS = {
+    "button": ("button", "btn"),
+    "input": ("input", "field", "text", "edit"),
+    "checkbox": ("checkbox", "check"),
+    "switch": ("switch", "toggle"),
+    "image": ("image", "img", "icon"),
+    "list": ("list", "listview", "recycler"),
+    "text": ("text", "label", "textview"),
+    "link": ("link",),
+}
+
+# Attributes that identify an element best, weighted up in candidate scoring.
+# Platforms other than Android are treated as iOS
+_KEY_ATTRIBUTES = {
+    "android": ("resource-id", "text", "content-desc"),
+    "ios": ("name", "label", "value"),
+}
+
+# Lowercased tag and class name fragments of each element type
+_TYPE_PATTERNS_LOWER = {
+    "button": ("button", "btn"),
+    "input": ("edittext", "textfield", "input"),
+    "checkbox": ("checkbox", "check"),
+    "switch": ("switch", "toggle"),
+    "image": ("image", "imageview", "imagebutton"),
+    "list": ("listview", "recyclerview", "scrollview"),
+    "text": ("textview", "text", "label"),
+    "link": ("link",),
+}
+
+# Screens with fewer candidate identifiers than this are scored with Python sets,
+# which is faster than crossing into compiled code for a handful of comparisons
+_NUMBA_MIN_CANDIDATES = 64
+
+# Token hashes used by the compiled scorer are 64-bit
+_TOKEN_HASH_MASK = 0xFFFFFFFFFFFFFFFF
+
+# Page sources at least this long have their candidate searches run in worker
+# threads; below it a search is quicker than handing it to a thread
+_THREAD_MIN_LENGTH = 100_000
+
+# Maximum number of suggestions remembered per agent
+_SUGGESTION_CACHE_SIZE = 100
+
+# Maximum number of failed suggestions remembered per agent
+_PREVIOUS_SUGGESTIONS_SIZE = 256
+
+# Page sources longer than this are reduced to windows around the best matches
+_FOCUS_MIN_LENGTH = 5000
+
+# Hard cap on the page source sent to the LLM
+_FULL_PAGE_MAX_LENGTH = 12000
+
+# Fixed parts of the multi-window prompt. Each window is rendered from the
+# template with its window dictionary
+_WINDOW_PROMPT_TEMPLATE = """
+            
+            WINDOW {window_num} (Match: {match_type} - {match_attribute}="{match_value}", Score: {similarity_score:.2f}):
+            ```xml
+            {xml}
+            ```
+            """
+_ANDROID_WINDOW_PROMPT_INSTRUCTIONS = """
+            For Android UI elements, prioritize these locator types in this order:
+            1. resource-id: The unique identifier for the element (PREFERRED)
+            2. text: The visible text of the element
+            3. content-desc: The accessibility description
+            4. xpath: XPath expression as a last resort (keep it simple)
+            
+            Example Android responses:
+            {"resource-id": "com.example.app:id/element_id"}
+            or
+            {"text": "Element Text"}
+            or
+            {"content-desc": "Element Description"}
+            or
+            {"xpath": "//android.widget.Button[@text='Element Text']"}
+            """
+_IOS_WINDOW_PROMPT_INSTRUCTIONS = """
+            For iOS UI elements, prioritize these locator types in this order:
+            1. name: The accessibility identifier (PREFERRED)
+            2. label: The accessibility label
+            3. value: The element's value
+            4. xpath: XPath expression as a last resort (keep it simple)
+            
+            Example iOS responses:
+            {"name": "elementName"}
+            or
+            {"label": "Element Label"}
+            or
+            {"value": "Element Value"}
+            or
+            {"xpath": "//XCUIElementTypeButton[@label='Element Label']"}
+            """
+_WINDOW_PROMPT_INSTRUCTIONS = """
+        
+        Based on these UI windows, analyze the XML to find the BEST locator for the element that most closely matches '{missing_element}'.
+        
+        IMPORTANT:
+        1. Prioritize resource-id (Android) or name (iOS) locators over XPath whenever possible
+        2. If using XPath, keep it simple and avoid complex expressions
+        3. Choose the most reliable and unique locator from any window
+        4. For buttons or tap targets, look for elements with clickable="true" or Button in the class/tag
+        5. Pay special attention to elements where clickable="true" when looking for interactive elements
+        
+        Return your answer in JSON format with one of the fields based on what you find.
+        Return ONLY the JSON without any explanation.
+        """
+
+# Fixed parts of the full page prompt
+_ANDROID_FULL_PAGE_PROMPT_INSTRUCTIONS = """
+                For Android UI elements, look for these attributes in order of preference:
+                1. resource-id: The unique identifier (MOST RELIABLE)
+                2. text: The visible text 
+                3. content-desc: The accessibility description
+                4. clickable="true" attribute for interactive elements
+                5. class attributes that indicate the element type (Button, TextView, etc.)
+                
+                Return your answer in JSON format with one of these fields:
+                - "resource-id": if you find a matching resource ID
+                - "text": if you find matching text content
+                - "content-desc": if you find a matching content description
+                - "xpath": if you need to provide an XPath expression (as a last resort)
+                
+                Prioritize resource-id over xpath where possible.
+                """
+_IOS_FULL_PAGE_PROMPT_INSTRUCTIONS = """
+                For iOS UI elements, look for these attributes in order of preference:
+                1. name: The accessibility identifier (MOST RELIABLE)
+                2. label: The accessibility label
+                3. value: The element's value
+                4. type attributes that indicate the element type (Button, etc.)
+                
+                Return your answer in JSON format with one of these fields:
+                - "name": if you find a matching name
+                - "label": if you find a matching label
+                - "value": if you find a matching value
+                - "xpath": if you need to provide an XPath expression (as a last resort)
+                
+                Prioritize name over xpath where possible.
+                """
+_FULL_PAGE_PROMPT_INSTRUCTIONS = """
+            
+            Remember to look for CLICKABLE ELEMENTS when the target appears to be a button.
+            Elements with clickable="true" attribute are interactive and often represent buttons.
+            
+            RETURN ONLY THE JSON without any explanation.
+            """
+
+_ATTRIBUTE_PATTERNS = {
+    "resource-id": _RESOURCE_ID_RE,
+    "text": _TEXT_RE,
+    "content-desc": _CONTENT_DESC_RE,
+    "name": _NAME_RE,
+    "label": _LABEL_RE,
+    "value": _VALUE_RE,
+}
+
+# Attributes that can identify an element on their own, in order of preference
+_EXACT_MATCH_ATTRIBUTES = {
+    "android": ("resource-id", "content-desc", "text"),
+    "ios": ("name", "label", "value"),
+}
+
+# iOS attributes used to build class chains, in order of preference
+_CLASS_CHAIN_ATTRIBUTES = ("name", "label")
+
+# Compiled XPath expressions used when lxml is available
+if has_lxml:
+    _ATTRIBUTE_XPATHS = {
+        attribute: lxml_etree.XPath(f"//@{attribute}[. != '']", smart_strings=False)
+        for attribute in _ATTRIBUTE_PATTERNS
+    }
+    _IOS_CHAIN_ELEMENTS_XPATH = lxml_etree.XPath(
+        "//*[starts-with(local-name(), 'XCUIElementType')][@name != '' or @label != '']"
+    )
+    # Counts the elements whose attribute $name equals $value
+    _ATTRIBUTE_COUNT_XPATH = lxml_etree.XPath("count(//*[@*[local-name() = $name] = $value])")
+    # Recovers from malformed page sources in a single pass. Comments and
+    # processing instructions are dropped so every node is an element, and
+    # huge_tree lifts libxml2's depth limit for deeply nested hierarchies
+    _RECOVER_PARSER = lxml_etree.XMLParser(
+        recover=True, huge_tree=True, remove_comments=True, remove_pis=True
+    )
+
+
+def _element_to_string(element: Any) -> str:
+    """
+    Serialize an ElementTree or lxml element, without the text that follows
+    it in its parent.
+    
+    Args:
+        element: XML element
+        
+    Returns:
+        XML string of the element
+    """
+    if has_lxml and isinstance(element, lxml_etree._Element):
+        return lxml_etree.tostring(element, encoding="unicode", with_tail=False)
+    if element.tail:
+        # A shallow copy shares the children, only the tail is dropped
+        element = copy.copy(element)
+        element.tail = None
+    return ET.tostring(element, encoding="unicode")
+
+
+if has_numba:
+    @njit(cache=True)
+    def _jaccard_sorted_rows(query, tokens, offsets, rows):
+        """
+        Calculate the Jaccard similarity of a token hash set with rows of a
+        packed token hash table, using a two-pointer sweep over sorted hashes.
+        
+        Args:
+            query: Sorted unique token hashes of the search key
+            tokens: Sorted unique token hashes of all rows, concatenated
+            offsets: Start of each row in tokens, followed by the end of the last
+            rows: Rows to score
+            
+        Returns:
+            Similarity score of each row
+        """
+        scores = np.zeros(rows.shape[0])
+        for k in range(rows.shape[0]):
+            start = offsets[rows[k]]
+            end = offsets[rows[k] + 1]
+            if start == end or query.shape[0] == 0:
+                continue
+            i = 0
+            j = start
+            overlap = 0
+            while i < query.shape[0] and j < end:
+                if query[i] == tokens[j]:
+                    overlap += 1
+                    i += 1
+                    j += 1
+                elif query[i] < tokens[j]:
+                    i += 1
+                else:
+                    j += 1
+            scores[k] = overlap / (query.shape[0] + (end - start) - overlap)
+        return scores
+
+
+def _pack_token_sets(content_tokens: List[frozenset], desc_tokens: List[frozenset]) -> Tuple[Any, Any]:
+    """
+    Pack identifier token sets into a table of sorted token hashes, with the
+    content and description of identifier i in rows 2i and 2i + 1.
+    
+    Args:
+        content_tokens: Content token set of each identifier
+        desc_tokens: Description token set of each identifier
+        
+    Returns:
+        Tuple of the concatenated token hashes and the row offsets
+    """
+    rows = [
+        np.unique(np.array([hash(token) & _TOKEN_HASH_MASK for token in tokens], dtype=np.uint64))
+        for pair in zip(content_tokens, desc_tokens)
+        for tokens in pair
+    ]
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(row) for row in rows])
+    tokens = np.concatenate(rows) if rows else np.zeros(0, dtype=np.uint64)
+    return tokens, offsets
+
+
+def _build_element_type_automaton() -> "ahocorasick.Automaton":
+    """
+    Build an Aho-Corasick automaton finding every element type keyword in
+    one pass, each keyword mapped to the precedence and name of its type.
+    
+    Returns:
+        Automaton over the element type keywords
+    """
+    automaton = ahocorasick.Automaton()
+    for precedence, (element_type, keywords) in enumerate(_ELEMENT_TYPE_KEYWORDS.items()):
+        for keyword in keywords:
+            # A keyword listed under several types hints at the first of them
+            if not automaton.exists(keyword):
+                automaton.add_word(keyword, (precedence, element_type))
+    automaton.make_automaton()
+    return automaton
+
+
+if has_ahocorasick:
+    _ELEMENT_TYPE_AUTOMATON = _build_element_type_automaton()
+
+
+def _jaccard(tokens1: frozenset, tokens2: frozenset) -> float:
+    """
+    Calculate the Jaccard similarity of two token sets.
+    
+    Args:
+        tokens1: First token set
+        tokens2: Second token set
+        
+    Returns:
+        Similarity score between 0 and 1
+    """
+    if not tokens1 or not tokens2:
+        return 0.0
+    intersection = len(tokens1 & tokens2)
+    return intersection / (len(tokens1) + len(tokens2) - intersection)
+
+
+@lru_cache(maxsize=4096)
+def _tokenize(identifier: str) -> Tuple[str, ...]:
+    """
+    Tokenize an identifier into lowercase words.
+    Cached, since the same search keys and screen identifiers are
+    tokenized on every lookup.
+    
+    Args:
+        identifier: The identifier to tokenize
+        
+    Returns:
+        Tuple of tokens
+    """
+    # Handle camelCase (insert space before uppercase letters preceded by lowercase)
+    identifier = _CAMEL_RE.sub(r'\1 \2', identifier)
+    
+    # Split on common delimiters and non-alphanumeric characters
+    return tuple(token.lower() for token in _SPLIT_RE.split(identifier) if token)
+
+
+def _source_contains(page_source: str, needle: str) -> bool:
+    """
+    Check whether a page source contains a substring.
+    StringZilla's SIMD search is used when available; it only pays off on
+    page-sized haystacks, so attribute values keep the plain `in` test.
+    
+    Args:
+        page_source: Page source to search
+        needle: Substring to look for
+        
+    Returns:
+        True if the page source contains the substring
+    """
+    if has_stringzilla:
+        return needle in stringzilla.Str(page_source)
+    return needle in page_source
+
+
+def _page_hash(page_source: str) -> int:
+    """
+    Hash a page source into a compact cache key.
+    
+    Args:
+        page_source: Page source to hash
+        
+    Returns:
+        64-bit hash of the page source
+    """
+    data = page_source.encode()
+    if has_xxhash:
+        return xxhash.xxh64_intdigest(data)
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def _suggestion_signature(locator: Any) -> int:
+    """
+    Get an order-independent signature for a locator.
+    
+    Args:
+        locator: Locator dictionary or string
+        
+    Returns:
+        Hash of the locator's items, or of its text if they are unhashable
+    """
+    if isinstance(locator, dict):
+        try:
+            return hash(frozenset(locator.items()))
+        except TypeError:
+            pass
+    return hash(str(locator))
+
+
+@lru_cache(maxsize=4)
+def _parse_page(page_source: str) -> Any:
+    """
+    Parse a page source into an element tree. The few most recent trees are
+    kept, so the retries within one lookup share a single parse.
+    
+    Args:
+        page_source: Page source to parse
+        
+    Returns:
+        Root element, from lxml when available and ElementTree otherwise
+        
+    Raises:
+        SyntaxError: If ElementTree cannot parse the page source
+        ValueError: If lxml cannot recover any element from the page source
+    """
+    # Drop a <window> wrapper that might have been added
+    source = page_source.removeprefix("<window>").removesuffix("</window>")
+    if has_lxml:
+        root = lxml_etree.fromstring(source.encode("utf-8"), _RECOVER_PARSER)
+        if root is None:
+            raise ValueError("No elements recovered from page source")
+        return root
+    return ET.fromstring(source)
+
+
+def _count_attribute_value(root: Any, attribute: str, value: str) -> int:
+    """
+    Count the elements of a parsed page whose attribute has a given value.
+    
+    Args:
+        root: Root element
+        attribute: Attribute name
+        value: Attribute value
+        
+    Returns:
+        Number of matching elements
+    """
+    if has_lxml and isinstance(root, lxml_etree._Element):
+        return int(_ATTRIBUTE_COUNT_XPATH(root, name=attribute, value=value))
+    return sum(1 for element in root.iter() if element.get(attribute) == value)
+
+
+# Indexes of parsed ElementTree pages, released with their trees
+_TREE_INDEXES: "weakref.WeakKeyDictionary[ET.Element, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+
+
+def _index_tree(root: ET.Element) -> Dict[str, Any]:
+    """
+    Get the lowercased tags and attributes of a parsed ElementTree page,
+    built in a single walk and shared by every search of the same tree.
+    
+    Args:
+        root: Root element
+        
+    Returns:
+        Index with the elements in document order, their lowercased tags
+        and attributes at the same positions, and for each attribute name
+        the positions and lowercased values of the elements where it is
+        not empty
+    """
+    index = _TREE_INDEXES.get(root)
+    if index is not None:
+        return index
+    
+    elements = list(root.iter())
+    tags_lower = []
+    attribs_lower = []
+    attributes = {}
+    for position, element in enumerate(elements):
+        tags_lower.append(element.tag.lower())
+        attrib = {name: value.lower() for name, value in element.attrib.items()}
+        attribs_lower.append(attrib)
+        for name, value in attrib.items():
+            if value:
+                attributes.setdefault(name, []).append((position, value))
+    
+    index = {
+        "elements": elements,
+        "tags_lower": tags_lower,
+        "attribs_lower": attribs_lower,
+        "attributes": attributes
+    }
+    _TREE_INDEXES[root] = index
+    return index
+
+
+def _compact_xml(page_source: str) -> str:
+    """
+    Shrink a page source by removing empty identifying attributes and empty
+    XCUIElementTypeOther containers, in the spirit of WebDriverAgent's
+    pageSourceExcludedAttributes setting.
+    
+    Args:
+        page_source: Page source to compact
+        
+    Returns:
+        Compacted page source
+    """
+    page_source = _EMPTY_ATTRIBUTE_RE.sub('', page_source)
+    return _EMPTY_CONTAINER_RE.sub('', page_source)
+
+
+def _parse_llm_json(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse a JSON object from an LLM response.
+    Responses are usually a bare JSON object, which is parsed directly;
+    anything else goes through extract_json.
+    
+    Args:
+        text: LLM response
+        
+    Returns:
+        Parsed JSON object or None if not found/invalid
+    """
+    try:
+        parsed = _json.loads(text)
+    except (ValueError, TypeError):
+        # orjson.JSONDecodeError and json.JSONDecodeError are both ValueErrors
+        return extract_json(text)
+    return parsed if isinstance(parsed, dict) else extract_json(text)
+
+
+def _class_chain(element_type: str, attribute: str, value: str) -> str:
+    """
+    Build an iOS class chain matching an element by one attribute.
+    
+    Args:
+        element_type: XCUIElementType of the element
+        attribute: Attribute to match on
+        value: Attribute value
+        
+    Returns:
+        Class chain expression
+    """
+    return f'**/{element_type}[`{attribute} == "{value}"`]'
+
+
+@lru_cache(maxsize=64)
+def _parse_snapshot(page_source: str) -> Dict[str, Tuple[str, ...]]:
+    """
+    Collect everything the extractors read from a page source in one parse.
+    Uses lxml with compiled XPath expressions when available and the
+    standard library parser otherwise, falling back to regex scanning if the
+    page source is not valid XML. Results are cached per page source, so all
+    extractors share one parse.
+    
+    Args:
+        page_source: Page source to extract from
+        
+    Returns:
+        Dictionary mapping each attribute name to its unique values, and
+        "class-chain" to the iOS class chains, all in document order
+    """
+    try:
+        if has_lxml:
+            return _parse_snapshot_lxml(page_source)
+        return _parse_snapshot_etree(page_source)
+    except SyntaxError:
+        # Both ET.ParseError and lxml's XMLSyntaxError derive from SyntaxError
+        return _parse_snapshot_regex(page_source)
+
+
+def _parse_snapshot_lxml(page_source: str) -> Dict[str, Tuple[str, ...]]:
+    """
+    Parse a page source snapshot with lxml and compiled XPath expressions.
+    
+    Args:
+        page_source: Page source to extract from
+        
+    Returns:
+        Snapshot dictionary, see _parse_snapshot
+    """
+    tree = lxml_etree.fromstring(page_source.encode("utf-8"))
+    snapshot = {
+        attribute: tuple(dict.fromkeys(xpath(tree)))
+        for attribute, xpath in _ATTRIBUTE_XPATHS.items()
+    }
+    
+    class_chains = {}
+    for element in _IOS_CHAIN_ELEMENTS_XPATH(tree):
+        for attribute in _CLASS_CHAIN_ATTRIBUTES:
+            value = element.get(attribute)
+            if value:
+                class_chains[_class_chain(element.tag, attribute, value)] = None
+    snapshot["class-chain"] = tuple(class_chains)
+    return snapshot
+
+
+def _parse_snapshot_etree(page_source: str) -> Dict[str, Tuple[str, ...]]:
+    """
+    Parse a page source snapshot in a single streaming pass with ElementTree.
+    
+    Args:
+        page_source: Page source to extract from
+        
+    Returns:
+        Snapshot dictionary, see _parse_snapshot
+    """
+    found = {attribute: {} for attribute in _ATTRIBUTE_PATTERNS}
+    class_chains = {}
+    
+    for _, element in ET.iterparse(BytesIO(page_source.encode("utf-8")), events=("start",)):
+        for attribute, values in found.items():
+            value = element.get(attribute)
+            if value:
+                values[value] = None
+        
+        if element.tag.startswith("XCUIElementType"):
+            for attribute in _CLASS_CHAIN_ATTRIBUTES:
+                value = element.get(attribute)
+                if value:
+                    class_chains[_class_chain(element.tag, attribute, value)] = None
+        element.clear()
+    
+    snapshot = {attribute: tuple(values) for attribute, values in found.items()}
+    snapshot["class-chain"] = tuple(class_chains)
+    return snapshot
+
+
+def _parse_snapshot_regex(page_source: str) -> Dict[str, Tuple[str, ...]]:
+    """
+    Scan a page source that is not valid XML with regular expressions.
+    
+    Args:
+        page_source: Page source to extract from
+        
+    Returns:
+        Snapshot dictionary, see _parse_snapshot
+    """
+    # One scan over all attributes, dispatched on the captured attribute name;
+    # finditer streams matches instead of building a list of tuples first
+    found = {attribute: {} for attribute in _ATTRIBUTE_PATTERNS}
+    for match in _ATTRIBUTE_VALUE_RE.finditer(page_source):
+        found[match.group(1)][match.group(2)] = None
+    snapshot = {attribute: tuple(values) for attribute, values in found.items()}
+    
+    class_chains = {}
+    # Android page sources have no iOS elements, so skip the scan entirely
+    if _source_contains(page_source, "XCUIElementType"):
+        for element in _IOS_ELEMENT_RE.finditer(page_source):
+            # Search the attributes in place rather than on a copied substring
+            start, end = element.span(2)
+            for attribute in _CLASS_CHAIN_ATTRIBUTES:
+                match = _ATTRIBUTE_PATTERNS[attribute].search(page_source, start, end)
+                if match:
+                    class_chains[_class_chain(element.group(1), attribute, match.group(1))] = None
+    snapshot["class-chain"] = tuple(class_chains)
+    return snapshot
+
+# Platform override of the lookup running in the current task, with the agent
+# it applies to. Batched lookups run as separate tasks, so each sees its own
+_LOOKUP_PLATFORM: "contextvars.ContextVar[Optional[Tuple[Any, str]]]" = contextvars.ContextVar(
+    "checker_lookup_platform", default=None
+)
+
 class CheckerAgent(BaseAgent):
     """
     Agent responsible for finding UI elements when standard locators fail.
@@ -45,14 +812,23 @@ class CheckerAgent(BaseAgent):
         self.tools = get_tools_for_agent("checker")
         # Get platform from context manager if available
         self.platform = self.context_manager.get("platform", "android").lower()
-        # Track previously suggested corrections to avoid recursion
-        self.previous_suggestions = set()
+        # Signatures of recently failed locators, mapped to their text for prompts
+        self.previous_suggestions: "OrderedDict[int, str]" = OrderedDict()
         # Set higher similarity threshold to reduce false matches
         self.similarity_threshold = 0.6
         # Maximum number of windows to send to LLM
         self.max_windows = 3
-        # Force LLM usage flag
+        # Force LLM usage flag, also set for a single lookup by its retry count
         self.force_llm_usage = False
+        # Window score above which the best candidate is used without the LLM
+        self.direct_threshold = 0.85
+        # Prompts waiting to be sent together while a batch of inputs is
+        # executed, grouped by their system message
+        self._pending_prompts: Optional[Dict[str, List[Tuple[str, asyncio.Future]]]] = None
+        # Validated suggestions keyed by platform, missing element and page source hash
+        self._suggestion_cache: "OrderedDict[Tuple[str, str, int], Dict[str, str]]" = OrderedDict()
+        # Token index of each screen's identifiers, keyed by screen name
+        self._screen_indexes: Dict[str, Dict[str, Any]] = {}
         
         # Initialize network monitor
         driver = self.context_manager.get("driver")
@@ -66,13 +842,33 @@ class CheckerAgent(BaseAgent):
             logger.info(f"Network monitoring initialized in {self.name}")
         
         logger.info(f"Checker agent initialized for platform: {self.platform}")
+    
+    @property
+    def platform(self) -> str:
+        """
+        Platform of the lookup running in the current task, or the agent's
+        platform outside of a lookup with a platform override.
+        """
+        lookup = _LOOKUP_PLATFORM.get()
+        if lookup is not None and lookup[0] is self:
+            return lookup[1]
+        return self._platform
+    
+    @platform.setter
+    def platform(self, platform: str) -> None:
+        self._platform = platform
 
-    async def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def execute(
+        self,
+        input_data: Union[Dict[str, Any], List[Dict[str, Any]]]
+    ) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
         """
         Find an alternative locator for a UI element.
         
         Args:
-            input_data: Input data containing information about the missing element
+            input_data: Input data containing information about the missing element,
+                or a list of such inputs to look up together
+
                 - missing_element: The element that could not be found
                 - error_message: Error message from the failed operation
                 - page_source: Current page source
@@ -81,8 +877,13 @@ class CheckerAgent(BaseAgent):
                 - failed_suggestions: List of previously failed suggestions (optional)
                 
         Returns:
-            Dictionary containing the alternative locator
+            Dictionary containing the alternative locator, or a list of them
+            in input order when given a list
         """
+        if isinstance(input_data, list):
+            return await self._execute_batch(input_data)
+        
+        platform_token = None
         try:
             # Extract input data
             missing_element = input_data.get("missing_element")
@@ -94,15 +895,12 @@ class CheckerAgent(BaseAgent):
             # Get failed suggestions from input or previous suggestions set
             failed_suggestions = input_data.get("failed_suggestions", [])
             for failed in failed_suggestions:
-                if isinstance(failed, dict):
-                    # Add stringified representation
-                    self.previous_suggestions.add(str(failed))
-                else:
-                    self.previous_suggestions.add(str(failed))
+                self._add_failed_suggestion(failed)
             
-            # Update platform if override provided
+            # Override the platform for this lookup only, as the lookups of
+            # a batch run concurrently on the same agent
             if platform_override:
-                self.platform = platform_override.lower()
+                platform_token = _LOOKUP_PLATFORM.set((self, platform_override.lower()))
                 logger.debug(f"Platform override: {self.platform}")
             
             if not missing_element:
@@ -110,64 +908,128 @@ class CheckerAgent(BaseAgent):
                 
             if not page_source:
                 return {"error": "No page source provided"}
+            
+            # Drop attributes and containers that cannot identify an element
+            page_source = _compact_xml(page_source)
                 
             # Wait for network to become idle before analyzing page
             # This reduces false negatives when content is still loading
-            await self.network_monitor.wait_for_network_idle(timeout=2, idle_threshold=0.5)
+            if self.network_monitor:
+                await self.network_monitor.wait_for_network_idle(timeout=2, idle_threshold=0.5)
             
             # Check if this is a retry and if we should force LLM usage
+            force_llm_usage = self.force_llm_usage
             if retry_count > 0:
                 logger.info(f"Retry #{retry_count} - Prioritizing LLM suggestions")
-                self.force_llm_usage = True
+                force_llm_usage = True
                 
                 # Track the failed element
-                if str(missing_element) not in self.previous_suggestions:
+                if _suggestion_signature(missing_element) not in self.previous_suggestions:
                     logger.info(f"Adding failed suggestion to history: {missing_element}")
-                    self.previous_suggestions.add(str(missing_element))
+                    self._add_failed_suggestion(missing_element)
                 else:
-                    logger.warning(f"Previously suggested element failed again: {missing_element}")
+                    logger.warning(f"Previously failed element failed again: {missing_element}")
+                
+            # Resolve an exact attribute match locally without asking the LLM
+            if not force_llm_usage:
+                exact_match = self._find_exact_match(missing_element, page_source)
+                if exact_match and _suggestion_signature(exact_match) not in self.previous_suggestions:
+                    logger.info(f"Exact match found without LLM: {exact_match}")
+                    return exact_match
+                
+            # Reuse the suggestion already made for this element on this page,
+            # unless it has been reported as failed since
+            cache_key = (self.platform, str(missing_element), _page_hash(page_source))
+            cached_suggestion = self._suggestion_cache.get(cache_key)
+            if cached_suggestion is not None:
+                self._suggestion_cache.move_to_end(cache_key)
+                if _suggestion_signature(cached_suggestion) not in self.previous_suggestions:
+                    logger.info(f"Reusing cached suggestion: {cached_suggestion}")
+                    return cached_suggestion
+                logger.info(f"Cached suggestion has failed, asking for another: {cached_suggestion}")
                 
             # If element is an XPath, extract search terms for better matching
             search_terms = self._extract_search_terms(missing_element)
             logger.info(f"Extracted search terms from {missing_element}: {search_terms}")
 
-            # Try the multi-window approach
+            # Extract the context windows once for the attempts below
+            windows = await self._extract_multiple_context_windows(page_source, missing_element, search_terms)
+            
+            # Use a high-confidence candidate directly without asking the LLM
+            if not force_llm_usage and windows:
+                direct_locator = self._get_direct_locator(windows, missing_element, search_terms, page_source)
+                if direct_locator and _suggestion_signature(direct_locator) not in self.previous_suggestions:
+                    logger.info(f"High-confidence match found without LLM: {direct_locator}")
+                    return direct_locator
+
+            # Try the multi-window approach. If the cached suggestion has failed,
+            # the LLM would repeat it, so ask for a different one directly
             llm_suggestion = await self._get_llm_multi_window_suggestion(
-                missing_element, error_message, page_source, search_terms
+                missing_element, error_message, page_source, search_terms,
+                avoid_previous=cached_suggestion is not None,
+                windows=windows
             )
             
             if llm_suggestion:
                 validated_suggestion = self._validate_locator(llm_suggestion)
                 
-                # Check if this suggestion was already tried before
-                if str(validated_suggestion) in self.previous_suggestions:
+                # Check if this suggestion has already failed before
+                if cached_suggestion is None and _suggestion_signature(validated_suggestion) in self.previous_suggestions:
                     logger.warning(f"LLM suggested a previously failed locator: {validated_suggestion}")
-                    # Try again explicitly asking for a different suggestion
-                    llm_suggestion = await self._get_llm_multi_window_suggestion(
-                        missing_element, 
-                        error_message, 
-                        page_source, 
-                        search_terms,
-                        avoid_previous=True
-                    )
-                    if llm_suggestion:
-                        validated_suggestion = self._validate_locator(llm_suggestion)
+                    # Take the next best candidate of the same windows, if any,
+                    # unless only the LLM's suggestions are wanted
+                    next_best = None
+                    if not force_llm_usage:
+                        next_best = self._get_next_best_locator(windows, page_source)
+                    if next_best:
+                        logger.info(f"Using next best candidate instead: {next_best}")
+                        validated_suggestion = next_best
+                    else:
+                        # Try again explicitly asking for a different suggestion
+                        llm_suggestion = await self._get_llm_multi_window_suggestion(
+                            missing_element, 
+                            error_message, 
+                            page_source, 
+                            search_terms,
+                            avoid_previous=True,
+                            windows=windows
+                        )
+                        if llm_suggestion:
+                            validated_suggestion = self._validate_locator(llm_suggestion)
                 
-                # Track this suggestion for future reference
-                self.previous_suggestions.add(str(validated_suggestion))
+                # Remember this suggestion for the same element on the same page
+                self._cache_suggestion(cache_key, validated_suggestion)
                 logger.info(f"LLM suggested alternative: {validated_suggestion}")
                 return validated_suggestion
                 
-            # If all else fails, try with full page source as a last resort
+            # If all else fails, retry with the closest candidates even if they
+            # score below the relevance threshold, which is far smaller than
+            # the full page source. Text windows of the raw source are not
+            # wanted here, as the full page is sent when no element matches
             if not llm_suggestion:
-                logger.warning("No suggestion from multi-window approach, trying with full page source")
-                full_page_suggestion = await self._get_llm_suggestion_with_full_page(
-                    missing_element, error_message, page_source, list(self.previous_suggestions)
+                best_effort_windows = await self._extract_multiple_context_windows(
+                    page_source, missing_element, search_terms, min_score=0.0, fallback=False
                 )
-                if full_page_suggestion:
-                    validated_suggestion = self._validate_locator(full_page_suggestion)
-                    self.previous_suggestions.add(str(validated_suggestion))
-                    logger.info(f"Full page LLM suggested alternative: {validated_suggestion}")
+                if best_effort_windows:
+                    logger.warning("No suggestion from multi-window approach, trying best-effort windows")
+                    last_resort_suggestion = await self._get_llm_multi_window_suggestion(
+                        missing_element,
+                        error_message,
+                        page_source,
+                        search_terms,
+                        avoid_previous=cached_suggestion is not None,
+                        windows=best_effort_windows
+                    )
+                else:
+                    # Only send the full page source when there is nothing to focus on
+                    logger.warning("No suggestion from multi-window approach, trying with full page source")
+                    last_resort_suggestion = await self._get_llm_suggestion_with_full_page(
+                        missing_element, error_message, page_source, list(self.previous_suggestions.values())
+                    )
+                if last_resort_suggestion:
+                    validated_suggestion = self._validate_locator(last_resort_suggestion)
+                    self._cache_suggestion(cache_key, validated_suggestion)
+                    logger.info(f"Last resort LLM suggested alternative: {validated_suggestion}")
                     return validated_suggestion
             
             logger.warning(f"No alternative found for missing element: {missing_element}")
@@ -178,6 +1040,94 @@ class CheckerAgent(BaseAgent):
             logger.error(error_details["message"], exc_info=True)
             
             return {"error": error_details["message"]}
+        
+        finally:
+            if platform_token is not None:
+                _LOOKUP_PLATFORM.reset(platform_token)
+    
+    def _add_failed_suggestion(self, suggestion: Any) -> None:
+        """
+        Record a locator as failed, forgetting the least recently recorded
+        one when the record is full. Suggestions that are only returned are
+        not recorded, so repeated lookups can be served from the cache.
+        
+        Args:
+            suggestion: Locator dictionary or string
+        """
+        signature = _suggestion_signature(suggestion)
+        self.previous_suggestions[signature] = str(suggestion)
+        self.previous_suggestions.move_to_end(signature)
+        if len(self.previous_suggestions) > _PREVIOUS_SUGGESTIONS_SIZE:
+            self.previous_suggestions.popitem(last=False)
+    
+    def _cache_suggestion(self, key: Tuple[str, str, int], suggestion: Dict[str, str]) -> None:
+        """
+        Remember a validated suggestion, evicting the least recently used one
+        when the cache is full.
+        
+        Args:
+            key: Platform, missing element and page source hash
+            suggestion: Validated suggestion
+        """
+        self._suggestion_cache[key] = suggestion
+        self._suggestion_cache.move_to_end(key)
+        if len(self._suggestion_cache) > _SUGGESTION_CACHE_SIZE:
+            self._suggestion_cache.popitem(last=False)
+    
+    async def _execute_batch(self, inputs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Find alternative locators for several missing elements.
+        The lookups run concurrently and the LLM prompts they issue are sent
+        together through generate_responses_batch.
+        
+        Args:
+            inputs: List of input data dictionaries, as accepted by execute
+            
+        Returns:
+            List of results, in the same order as the inputs
+        """
+        self._pending_prompts = {}
+        try:
+            return await asyncio.gather(*(self.execute(input_data) for input_data in inputs))
+        finally:
+            self._pending_prompts = None
+    
+    async def _get_batched_llm_response(self, prompt: str, system_message: str) -> str:
+        """
+        Queue a prompt to be sent in the current batch and wait for its response.
+        Prompts are batched with others of the same system message, which
+        differs between platforms. The first prompt queued for a system
+        message sends its batch once the other lookups have had a chance to
+        queue theirs.
+        
+        Args:
+            prompt: Prompt for the LLM
+            system_message: System message for the batch
+            
+        Returns:
+            LLM response
+        """
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending_prompts.setdefault(system_message, [])
+        pending.append((prompt, future))
+        
+        if len(pending) == 1:
+            # Let the concurrent lookups run up to their own LLM calls
+            await asyncio.sleep(0)
+            batch = self._pending_prompts.pop(system_message)
+            try:
+                responses = await self.generate_responses_batch(
+                    [batched_prompt for batched_prompt, _ in batch],
+                    system_message=system_message
+                )
+                for (_, batched_future), response in zip(batch, responses):
+                    batched_future.set_result(response)
+            except Exception as e:
+                for _, batched_future in batch:
+                    if not batched_future.done():
+                        batched_future.set_exception(e)
+        
+        return await future
     
     async def _find_from_screen_definitions(
         self, 
@@ -204,6 +1154,11 @@ class CheckerAgent(BaseAgent):
         # Get current screen context if available
         current_screen = self.context_manager.get("current_screen")
         
+        # Tokenize the search key once for every comparison
+        query_tokens = frozenset(_tokenize(str(search_key)))
+        if not query_tokens:
+            return None
+        
         # Try to find the element in screen definitions
         matched_element = None
         highest_score = 0
@@ -212,45 +1167,18 @@ class CheckerAgent(BaseAgent):
         if current_screen:
             screen_def = screens_registry.get_screen(current_screen)
             if screen_def:
-                identifiers = screen_def.get("identifiers", [])
-                
-                # Check screen identifiers for potential matches
-                for element in identifiers:
-                    content = element.get("content", "")
-                    description = element.get("description", "")
-                    
-                    if not content and not description:
-                        continue
-                        
-                    # Calculate similarity
-                    content_sim = self._calculate_token_similarity(content, search_key)
-                    desc_sim = self._calculate_token_similarity(description, search_key)
-                    similarity = max(content_sim, desc_sim)
-                    
-                    if similarity > highest_score and similarity > self.similarity_threshold:
-                        highest_score = similarity
-                        matched_element = element
+                matched_element, highest_score = self._match_screen_identifiers(
+                    current_screen, screen_def, query_tokens, highest_score
+                )
         
         # If no match found, try all screens
         if not matched_element:
             for screen_name, screen_def in screens_registry.get_all_screens().items():
-                identifiers = screen_def.get("identifiers", [])
-                
-                for element in identifiers:
-                    content = element.get("content", "")
-                    description = element.get("description", "")
-                    
-                    if not content and not description:
-                        continue
-                        
-                    # Calculate similarity
-                    content_sim = self._calculate_token_similarity(content, search_key)
-                    desc_sim = self._calculate_token_similarity(description, search_key)
-                    similarity = max(content_sim, desc_sim)
-                    
-                    if similarity > highest_score and similarity > self.similarity_threshold:
-                        highest_score = similarity
-                        matched_element = element
+                element, highest_score = self._match_screen_identifiers(
+                    screen_name, screen_def, query_tokens, highest_score
+                )
+                if element:
+                    matched_element = element
         
         # If we found a matching element, convert it to a locator
         if matched_element:
@@ -258,6 +1186,107 @@ class CheckerAgent(BaseAgent):
         
         return None
     
+    def _get_screen_index(
+        self,
+        screen_name: str,
+        screen_def: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Get the token index of a screen's identifiers, building it on first use.
+        The index holds parallel lists so scoring reads the token sets by
+        position without touching the identifier dicts.
+        
+        Args:
+            screen_name: Name of the screen
+            screen_def: Screen definition
+            
+        Returns:
+            Dictionary with:
+                - identifiers: The screen's identifier dicts
+                - content_tokens: Content token set of each identifier
+                - desc_tokens: Description token set of each identifier
+                - inverted: Positions of the identifiers containing each token
+                - packed: Token sets packed for the compiled scorer (None if
+                  numba is not available)
+        """
+        identifiers = screen_def.get("identifiers", [])
+        index = self._screen_indexes.get(screen_name)
+        if index is not None and index["identifiers"] is identifiers:
+            return index
+        
+        content_tokens = [frozenset(_tokenize(str(element.get("content", "")))) for element in identifiers]
+        desc_tokens = [frozenset(_tokenize(str(element.get("description", "")))) for element in identifiers]
+        
+        inverted = {}
+        for position, tokens in enumerate(zip(content_tokens, desc_tokens)):
+            for token in tokens[0] | tokens[1]:
+                inverted.setdefault(token, []).append(position)
+        
+        index = {
+            "identifiers": identifiers,
+            "content_tokens": content_tokens,
+            "desc_tokens": desc_tokens,
+            "inverted": inverted,
+            "packed": _pack_token_sets(content_tokens, desc_tokens) if has_numba else None,
+        }
+        self._screen_indexes[screen_name] = index
+        return index
+    
+    def _match_screen_identifiers(
+        self,
+        screen_name: str,
+        screen_def: Dict[str, Any],
+        query_tokens: frozenset,
+        highest_score: float
+    ) -> Tuple[Optional[Dict[str, Any]], float]:
+        """
+        Find the screen identifier most similar to a tokenized search key.
+        Only identifiers sharing a token with the search key are scored.
+        
+        Args:
+            screen_name: Name of the screen
+            screen_def: Screen definition
+            query_tokens: Tokens of the search key
+            highest_score: Score a match has to beat
+            
+        Returns:
+            Tuple of the best matching identifier (None if no identifier beats
+            highest_score) and the highest score
+        """
+        index = self._get_screen_index(screen_name, screen_def)
+        inverted = index["inverted"]
+        packed = index["packed"]
+        
+        candidates = set()
+        for token in query_tokens:
+            candidates.update(inverted.get(token, ()))
+        # Visit candidates in definition order so ties go to the first identifier
+        positions = sorted(candidates)
+        
+        if packed is not None and len(positions) >= _NUMBA_MIN_CANDIDATES:
+            # Score content and description rows of all candidates in one call
+            tokens, offsets = packed
+            query = np.unique(np.array([hash(token) & _TOKEN_HASH_MASK for token in query_tokens], dtype=np.uint64))
+            rows = np.array([row for position in positions for row in (2 * position, 2 * position + 1)], dtype=np.int64)
+            scores = _jaccard_sorted_rows(query, tokens, offsets, rows).reshape(-1, 2).max(axis=1)
+            similarities = zip(positions, scores.tolist())
+        else:
+            content_tokens = index["content_tokens"]
+            desc_tokens = index["desc_tokens"]
+            similarities = (
+                (position, max(_jaccard(content_tokens[position], query_tokens),
+                               _jaccard(desc_tokens[position], query_tokens)))
+                for position in positions
+            )
+        
+        matched_element = None
+        for position, similarity in similarities:
+            if similarity > highest_score and similarity > self.similarity_threshold:
+                highest_score = similarity
+                matched_element = index["identifiers"][position]
+        
+        return matched_element, highest_score
+    
     def _convert_element_to_locator(
         self, 
         element: Dict[str, Any], 
@@ -278,34 +1307,31 @@ class CheckerAgent(BaseAgent):
         if not content:
             return None
             
+        # Attribute values of the page, parsed once per page source
+        snapshot = _parse_snapshot(page_source)
+            
         # For Android, try text or resource-id
         if self.platform == "android":
             # First try exact text match
-            if content in page_source:
-                text_pattern = f'text="{content}"'
-                if text_pattern in page_source:
+            if _source_contains(page_source, content):
+                if content in snapshot["text"]:
                     return {"text": content}
                 
                 # Then try resource-id
-                resource_id_pattern = f'resource-id="[^"]*{content}[^"]*"'
-                resource_id_match = re.search(resource_id_pattern, page_source)
-                if resource_id_match:
-                    resource_id = re.search(r'resource-id="([^"]*)"', resource_id_match.group(0))
-                    if resource_id:
-                        return {"resource-id": resource_id.group(1)}
+                for resource_id in snapshot["resource-id"]:
+                    if content in resource_id:
+                        return {"resource-id": resource_id}
                 
                 # Then try XPath
                 return {"xpath": f"//*[contains(@text, '{content}')]"}
         # For iOS, try name, label or XPath
         else:
             # First try name
-            name_pattern = f'name="{content}"'
-            if name_pattern in page_source:
+            if content in snapshot["name"]:
                 return {"name": content}
                 
             # Then try label
-            label_pattern = f'label="{content}"'
-            if label_pattern in page_source:
+            if content in snapshot["label"]:
                 return {"label": content}
                 
             # Then try XPath
@@ -324,49 +1350,35 @@ class CheckerAgent(BaseAgent):
         Returns:
             List of search terms
         """
-        search_terms = []
-        
         # Convert to string if not already
         if not isinstance(search_key, str):
             search_key = str(search_key)
         
         # For XPath expressions, extract terms within quotes
         if search_key.startswith("//"):
-            # Extract terms from contains expressions
-            contains_terms = re.findall(r"contains\([^,]+,\s*['\"]([^'\"]+)['\"]\)", search_key)
-            search_terms.extend(contains_terms)
-            
-            # Extract terms from direct equality checks 
-            equality_terms = re.findall(r"@\w+\s*=\s*['\"]([^'\"]+)['\"]\]", search_key)
-            search_terms.extend(equality_terms)
+            # Extract terms from contains expressions and direct equality checks
+            search_terms = _XPATH_CONTAINS_RE.findall(search_key) + _XPATH_EQ_RE.findall(search_key)
             
             # If no terms found, look for any quoted strings
             if not search_terms:
-                quoted_terms = re.findall(r"['\"]([^'\"]+)['\"]", search_key)
-                search_terms.extend(quoted_terms)
+                search_terms = _QUOTED_RE.findall(search_key)
         else:
             # For regular search keys, tokenize by splitting on non-alphanumeric chars
-            tokens = re.findall(r'[a-zA-Z0-9]+', search_key)
-            search_terms.extend(tokens)
-        
-        # Add the original search key as a term if it's not too complex
-        if len(search_key) < 30 and not search_key.startswith("//"):
-            search_terms.append(search_key)
+            search_terms = _ALNUM_RE.findall(search_key)
+            
+            # Add the original search key as a term if it's not too complex
+            if len(search_key) < 30:
+                search_terms.append(search_key)
             
         # If we have a term like "add_task_button", also add split versions
-        for term in list(search_terms):  # Create a copy to avoid modification during iteration
-            if '_' in term:
-                search_terms.extend(term.split('_'))
-            elif '-' in term:
-                search_terms.extend(term.split('-'))
-        
-        # Remove duplicates while preserving order
-        unique_terms = []
-        for term in search_terms:
-            if term and term not in unique_terms:
-                unique_terms.append(term)
+        split_terms = [
+            part
+            for term in search_terms if '_' in term or '-' in term
+            for part in term.split('_' if '_' in term else '-')
+        ]
         
-        return unique_terms
+        # Remove empty terms and duplicates while preserving order
+        return [term for term in dict.fromkeys(search_terms + split_terms) if term]
     
     def _tokenize_identifier(self, identifier: str) -> List[str]:
         """
@@ -379,14 +1391,7 @@ class CheckerAgent(BaseAgent):
         Returns:
             List of tokens
         """
-        # Handle camelCase (insert space before uppercase letters preceded by lowercase)
-        identifier = re.sub(r'([a-z])([A-Z])', r'\1 \2', identifier)
-        
-        # Split on common delimiters and non-alphanumeric characters
-        tokens = re.split(r'[^a-zA-Z0-9]+', identifier)
-        
-        # Remove empty tokens and convert to lowercase
-        return [token.lower() for token in tokens if token]
+        return list(_tokenize(identifier))
     
     def _calculate_token_similarity(self, str1: str, str2: str) -> float:
         """
@@ -403,21 +1408,11 @@ class CheckerAgent(BaseAgent):
         str1 = str(str1) if not isinstance(str1, str) else str1
         str2 = str(str2) if not isinstance(str2, str) else str2
         
-        # Tokenize both strings
-        tokens1 = set(self._tokenize_identifier(str1))
-        tokens2 = set(self._tokenize_identifier(str2))
-        
-        if not tokens1 or not tokens2:
-            return 0.0
-            
-        # Calculate Jaccard similarity
-        intersection = tokens1.intersection(tokens2)
-        union = tokens1.union(tokens2)
-        
-        if not union:
-            return 0.0
-            
-        return len(intersection) / len(union)
+        # Tokenize both strings and calculate Jaccard similarity
+        return _jaccard(
+            frozenset(_tokenize(str1)),
+            frozenset(_tokenize(str2))
+        )
     
     def _extract_element_type_hint(self, search_key: str) -> Optional[str]:
         """
@@ -435,33 +1430,273 @@ class CheckerAgent(BaseAgent):
             
         search_key = search_key.lower()
         
-        # Common element types to look for
-        element_types = {
-            "button": ["button", "btn"],
-            "input": ["input", "field", "text", "edit"],
-            "checkbox": ["checkbox", "check"],
-            "switch": ["switch", "toggle"],
-            "image": ["image", "img", "icon"],
-            "list": ["list", "listview", "recycler"],
-            "text": ["text", "label", "textview"],
-            "link": ["link"]
-        }
+        # Find all keywords in one pass and take the type with the highest precedence
+        if has_ahocorasick:
+            matches = [value for _, value in _ELEMENT_TYPE_AUTOMATON.iter(search_key)]
+            return min(matches)[1] if matches else None
         
         # Check if any element type is in the search key
-        for element_type, keywords in element_types.items():
+        for element_type, keywords in _ELEMENT_TYPE_KEYWORDS.items():
             for keyword in keywords:
                 if keyword in search_key:
                     return element_type
                     
         return None
     
+    def _extract_resource_ids(self, page_source: str) -> List[str]:
+        """
+        Extract resource IDs from page source.
+        
+        Args:
+            page_source: Page source to extract from
+            
+        Returns:
+            List of unique resource IDs
+        """
+        return list(_parse_snapshot(page_source)["resource-id"])
+    
+    def _extract_texts(self, page_source: str) -> List[str]:
+        """
+        Extract text values from page source.
+        
+        Args:
+            page_source: Page source to extract from
+            
+        Returns:
+            List of unique text values
+        """
+        return list(_parse_snapshot(page_source)["text"])
+    
+    def _extract_content_descs(self, page_source: str) -> List[str]:
+        """
+        Extract content descriptions from page source.
+        
+        Args:
+            page_source: Page source to extract from
+            
+        Returns:
+            List of unique content descriptions
+        """
+        return list(_parse_snapshot(page_source)["content-desc"])
+    
+    def _extract_android_ui_selectors(self, page_source: str) -> List[str]:
+        """
+        Build Android UiSelector expressions for elements in page source.
+        
+        Args:
+            page_source: Page source to extract from
+            
+        Returns:
+            List of UiSelector expressions
+        """
+        attributes = _parse_snapshot(page_source)
+        selectors = [f'new UiSelector().resourceId("{resource_id}")'
+                     for resource_id in attributes["resource-id"]]
+        selectors += [f'new UiSelector().text("{text}")'
+                      for text in attributes["text"]]
+        selectors += [f'new UiSelector().description("{content_desc}")'
+                      for content_desc in attributes["content-desc"]]
+        return selectors
+    
+    def _extract_names(self, page_source: str) -> List[str]:
+        """
+        Extract names (accessibility identifiers) from iOS page source.
+        
+        Args:
+            page_source: Page source to extract from
+            
+        Returns:
+            List of unique names
+        """
+        return list(_parse_snapshot(page_source)["name"])
+    
+    def _extract_labels(self, page_source: str) -> List[str]:
+        """
+        Extract labels from iOS page source.
+        
+        Args:
+            page_source: Page source to extract from
+            
+        Returns:
+            List of unique labels
+        """
+        return list(_parse_snapshot(page_source)["label"])
+    
+    def _extract_values(self, page_source: str) -> List[str]:
+        """
+        Extract non-empty values from iOS page source.
+        
+        Args:
+            page_source: Page source to extract from
+            
+        Returns:
+            List of unique values
+        """
+        return list(_parse_snapshot(page_source)["value"])
+    
+    def _extract_ios_predicates(self, page_source: str) -> Iterator[str]:
+        """
+        Build iOS predicate strings for elements in page source, lazily so
+        callers looking for one match stop early.
+        
+        Args:
+            page_source: Page source to extract from
+            
+        Yields:
+            Predicate strings
+        """
+        snapshot = _parse_snapshot(page_source)
+        for attribute in ("name", "label", "value"):
+            for value in snapshot[attribute]:
+                yield f'{attribute} == "{value}"'
+    
+    def _extract_ios_class_chains(self, page_source: str) -> Iterator[str]:
+        """
+        Build iOS class chains for elements in page source, lazily so
+        callers looking for one match stop early.
+        
+        Args:
+            page_source: Page source to extract from
+            
+        Yields:
+            Class chain expressions
+        """
+        yield from _parse_snapshot(page_source)["class-chain"]
+    
+    def _get_direct_locator(
+        self,
+        windows: List[Dict[str, Any]],
+        search_key: Any,
+        search_terms: List[str],
+        page_source: str
+    ) -> Optional[Dict[str, str]]:
+        """
+        Build a locator for the best window's element if it can be used
+        without the LLM. Scores are capped at 1.0, which any clickable button
+        reaches, so the element must also have a key attribute equal to the
+        search key, and no other window's element may have one.
+        
+        Args:
+            windows: Context windows, best first
+            search_key: The element that could not be found
+            search_terms: Extracted search terms from the search key
+            page_source: Current page source
+            
+        Returns:
+            Locator for the best window's element, or None if it is not an
+            unambiguous high-confidence match
+        """
+        element = windows[0].get("element")
+        if element is None or windows[0]["similarity_score"] <= self.direct_threshold:
+            return None
+        
+        # XPath search keys are matched on the values they name, others whole
+        search_key = str(search_key)
+        targets = search_terms if search_key.startswith("//") else [search_key]
+        targets = {target.lower() for target in targets}
+        key_attributes = _KEY_ATTRIBUTES.get(self.platform, _KEY_ATTRIBUTES["ios"])
+        
+        def matches_exactly(candidate: Any) -> bool:
+            for attr_name in key_attributes:
+                value = candidate.get(attr_name)
+                # Compare resource IDs with and without their package prefix
+                if value and (value.lower() in targets or value.rsplit("/", 1)[-1].lower() in targets):
+                    return True
+            return False
+        
+        if not matches_exactly(element):
+            return None
+        if any(window.get("element") is not None and matches_exactly(window["element"]) for window in windows[1:]):
+            # Several candidates match exactly, let the LLM decide
+            return None
+        
+        return self._get_element_locator(element, page_source)
+    
+    def _get_next_best_locator(
+        self,
+        windows: List[Dict[str, Any]],
+        page_source: str
+    ) -> Optional[Dict[str, str]]:
+        """
+        Get a locator for the best-ranked window element that has not failed before.
+        
+        Args:
+            windows: Context windows, best first
+            page_source: Current page source
+            
+        Returns:
+            Locator for the element, or None if every window element has
+            already failed or cannot be located on its own
+        """
+        for window in windows:
+            element = window.get("element")
+            if element is None:
+                continue
+            locator = self._get_element_locator(element, page_source)
+            if locator and _suggestion_signature(locator) not in self.previous_suggestions:
+                return locator
+        
+        return None
+    
+    def _get_element_locator(self, element: Any, page_source: str) -> Optional[Dict[str, str]]:
+        """
+        Build a locator for a parsed element.
+        
+        Args:
+            element: Element of the parsed page source
+            page_source: Current page source
+            
+        Returns:
+            Locator on the element's most preferred identifying attribute whose
+            value is unique in the page, or None if there is no such attribute
+        """
+        root = _parse_page(page_source)
+        for attribute in _EXACT_MATCH_ATTRIBUTES.get(self.platform, ()):
+            value = element.get(attribute)
+            if value and _count_attribute_value(root, attribute, value) == 1:
+                return {attribute: value}
+        
+        return None
+    
+    def _find_exact_match(self, missing_element: Any, page_source: str) -> Optional[Dict[str, str]]:
+        """
+        Find an element whose identifying attribute equals the missing element.
+        
+        Args:
+            missing_element: The element that could not be found
+            page_source: Current page source
+            
+        Returns:
+            Locator for the single matching element, or None if there is no
+            match or the match is ambiguous
+        """
+        if not isinstance(missing_element, str) or not missing_element:
+            return None
+        
+        snapshot = _parse_snapshot(page_source)
+        for attribute in _EXACT_MATCH_ATTRIBUTES.get(self.platform, ()):
+            if missing_element not in snapshot[attribute]:
+                continue
+            # The snapshot keeps each value once, so count the elements in the tree
+            try:
+                count = _count_attribute_value(_parse_page(page_source), attribute, missing_element)
+            except (SyntaxError, ValueError):
+                return None
+            if count == 1:
+                return {attribute: missing_element}
+            # Several elements match, let the LLM decide
+            return None
+        
+        return None
+    
     async def _get_llm_multi_window_suggestion(
         self, 
         missing_element: str, 
         error_message: str, 
         page_source: str,
         search_terms: List[str],
-        avoid_previous: bool = False
+        avoid_previous: bool = False,
+        windows: Optional[List[Dict[str, Any]]] = None
     ) -> Optional[Dict[str, str]]:
         """
         Get LLM suggestion using multiple context windows approach.
@@ -472,6 +1707,7 @@ class CheckerAgent(BaseAgent):
             page_source: Current page source
             search_terms: Extracted search terms from the missing element
             avoid_previous: Whether to explicitly avoid previous suggestions
+            windows: Context windows to send, extracted from the page source if not given
             
         Returns:
             Dictionary containing the alternative locator or None if not found
@@ -483,7 +1719,8 @@ class CheckerAgent(BaseAgent):
                 return None
                 
             # Extract multiple context windows
-            windows = self._extract_multiple_context_windows(page_source, missing_element, search_terms)
+            if windows is None:
+                windows = await self._extract_multiple_context_windows(page_source, missing_element, search_terms)
             
             if not windows:
                 logger.warning("No context windows extracted, using fallback approach")
@@ -502,7 +1739,7 @@ class CheckerAgent(BaseAgent):
             llm_response = await self._get_llm_response(prompt)
             
             # Extract JSON from response
-            suggestion = extract_json(llm_response)
+            suggestion = _parse_llm_json(llm_response)
             if suggestion:
                 return suggestion
                 
@@ -514,75 +1751,87 @@ class CheckerAgent(BaseAgent):
             # Try the old approach as fallback
             return await self._get_llm_suggestion_fallback(missing_element, error_message, page_source)
     
-    def _extract_multiple_context_windows(
+    async def _extract_multiple_context_windows(
         self, 
         page_source: str, 
         search_key: str,
         search_terms: List[str],
-        max_windows: int = 3
+        max_windows: int = 3,
+        min_score: float = 0.3,
+        fallback: bool = True
     ) -> List[Dict[str, Any]]:
         """
         Extract multiple context windows from page source.
+        The tree scans of large page sources run in worker threads so they
+        overlap each other and do not block the event loop.
         
         Args:
             page_source: Page source to extract from
             search_key: The search key
             search_terms: List of search terms
             max_windows: Maximum number of windows to extract
+            min_score: Score a candidate must exceed to get a window
+            fallback: Whether to fall back to text windows of the raw page
+                source when no element scores above min_score
             
         Returns:
-            List of context windows
+            List of context windows, empty if none were found and fallback
+            is disabled
         """
         windows = []
         
         try:
             # Try to parse XML
             try:
-                cleaned_source = self._clean_xml(page_source)
-                root = ET.fromstring(cleaned_source)
+                root = _parse_page(page_source)
             except Exception as e:
                 logger.warning(f"Failed to parse XML: {str(e)}")
-                return self._extract_fallback_windows(page_source, search_terms)
+                return self._extract_fallback_windows(page_source, search_terms) if fallback else []
                 
-            # Strategy 1: Find elements by resource-id or name attribute
-            id_candidates = self._find_elements_by_attribute_match(
-                root, search_terms, ["resource-id", "name", "id"]
-            )
-            
-            # Strategy 2: Find elements by text, content-desc, or label
-            text_candidates = self._find_elements_by_attribute_match(
-                root, search_terms, ["text", "content-desc", "label", "value"]
-            )
-            
-            # Strategy 3: Find interactive elements like buttons
             element_type = self._extract_element_type_hint(search_key)
-            interactive_candidates = self._find_elements_by_type(
-                root, element_type, search_terms
-            )
+            strategies = [
+                # Strategy 1: Find elements by resource-id or name attribute
+                (self._find_elements_by_attribute_match, root, search_terms, ["resource-id", "name", "id"]),
+                # Strategy 2: Find elements by text, content-desc, or label
+                (self._find_elements_by_attribute_match, root, search_terms, ["text", "content-desc", "label", "value"]),
+                # Strategy 3: Find interactive elements like buttons
+                (self._find_elements_by_type, root, element_type, search_terms)
+            ]
+            if len(page_source) >= _THREAD_MIN_LENGTH:
+                results = await asyncio.gather(
+                    *(asyncio.to_thread(*strategy) for strategy in strategies)
+                )
+            else:
+                results = [strategy[0](*strategy[1:]) for strategy in strategies]
             
             # Combine all candidates
-            all_candidates = id_candidates + text_candidates + interactive_candidates
-            
-            # Score candidates by relevance
+            all_candidates = [candidate for candidates in results for candidate in candidates]
+        
+            # Score candidates by relevance, once per element even when
+            # several strategies found it, keeping those above min_score
             scored_candidates = []
+            scored_ids = set()
             for candidate in all_candidates:
-                score = self._score_candidate(candidate, search_key, search_terms)
-                scored_candidates.append((candidate, score))
+                if id(candidate) in scored_ids:
+                    continue
+                scored_ids.add(id(candidate))
+                score = self._score_candidate(candidate, search_key, search_terms, min_score)
+                if score > min_score:
+                    # Discovery order breaks ties, as a stable sort would
+                    scored_candidates.append((-score, len(scored_candidates), candidate))
                 
-            # Sort by score (descending)
-            scored_candidates.sort(key=lambda x: x[1], reverse=True)
-            
-            # Get top candidates
+            # Pop the best candidates off a heap until there are enough,
+            # rather than sorting all of them
+            heapq.heapify(scored_candidates)
             top_candidates = []
             seen_elements = set()
-            for candidate, score in scored_candidates:
+            while scored_candidates and len(top_candidates) < max_windows:
+                negative_score, _, candidate = heapq.heappop(scored_candidates)
                 # Generate a signature for the element to avoid duplicates
                 signature = self._get_element_signature(candidate)
-                if signature not in seen_elements and score > 0.3:  # Filter low-quality matches
+                if signature not in seen_elements:
                     seen_elements.add(signature)
-                    top_candidates.append((candidate, score))
-                    if len(top_candidates) >= max_windows:
-                        break
+                    top_candidates.append((candidate, -negative_score))
             
             # Extract well-formed XML for each candidate
             for i, (candidate, score) in enumerate(top_candidates):
@@ -598,59 +1847,23 @@ class CheckerAgent(BaseAgent):
                     "match_attribute": match_info["attribute"],
                     "match_value": match_info["value"],
                     "similarity_score": score,
-                    "xml": window_xml
+                    "xml": window_xml,
+                    "element": candidate
                 }
                 windows.append(window)
                 
             # If no windows, try a more aggressive approach
-            if not windows:
+            if not windows and fallback:
                 return self._extract_fallback_windows(page_source, search_terms)
                 
             return windows
                 
         except Exception as e:
             logger.warning(f"Error extracting context windows: {str(e)}")
-            return self._extract_fallback_windows(page_source, search_terms)
+            return self._extract_fallback_windows(page_source, search_terms) if fallback else []
     
     # ... [keeping many of the existing helper methods] ...
 
-    def _clean_xml(self, xml_text: str) -> str:
-        """
-        Clean XML text by handling common issues.
-        
-        Args:
-            xml_text: XML text to clean
-            
-        Returns:
-            Cleaned XML text
-        """
-        # Handle <window> wrapper that might have been added
-        if xml_text.startswith("<window>"):
-            xml_text = xml_text[8:]
-        if xml_text.endswith("</window>"):
-            xml_text = xml_text[:-9]
-            
-        # Fix XML declaration if needed
-        if not xml_text.startswith("<?xml "):
-            xml_text = '<?xml version="1.0" encoding="UTF-8" ?>\n' + xml_text
-            
-        # Find the first element start and last element end
-        first_element_start = xml_text.find("<", xml_text.find("?>"))
-        if first_element_start == -1:
-            first_element_start = 0
-            
-        # Try to find a root element name
-        root_match = re.search(r'<(\w+)[^>]*>', xml_text[first_element_start:])
-        if root_match:
-            root_name = root_match.group(1)
-            
-            # Check if the root element is properly closed
-            if f"</{root_name}>" not in xml_text:
-                # Wrap everything in the root element
-                xml_text = xml_text[:first_element_start] + f"<{root_name}>" + xml_text[first_element_start:] + f"</{root_name}>"
-                
-        return xml_text
-    
     def _extract_fallback_windows(
         self, 
         page_source: str, 
@@ -672,63 +1885,84 @@ class CheckerAgent(BaseAgent):
         windows = []
         
         try:
-            # Iteratively try each search term
-            for i, term in enumerate(search_terms):
-                # Skip very short terms
-                if len(term) < 3:
-                    continue
+            # Skip very short terms
+            terms = [term for term in search_terms if len(term) >= 3]
+            
+            if self.platform == "android":
+                attribute_re = _ANDROID_FALLBACK_RE
+                attribute_names = _ANDROID_FALLBACK_ATTRIBUTES
+                generic_patterns = (_ANDROID_BUTTON_RE, _ANDROID_CLICKABLE_RE)
+            else:
+                attribute_re = _IOS_FALLBACK_RE
+                attribute_names = _IOS_FALLBACK_ATTRIBUTES
+                generic_patterns = (_IOS_BUTTON_RE,)
+            
+            # Scan the page source once, keeping the first two attributes
+            # containing each term, per attribute name
+            # Only terms occurring somewhere in the page can be in a value,
+            # and a flat search rules the others out much faster than the scan
+            hits = {}
+            present_terms = [term for term in terms if _source_contains(page_source, term)]
+            if present_terms:
+                # Find all terms in a value in a single pass when possible
+                automaton = None
+                if has_ahocorasick:
+                    automaton = ahocorasick.Automaton()
+                    for term in present_terms:
+                        automaton.add_word(term, term)
+                    automaton.make_automaton()
                     
-                # Create patterns to look for
-                patterns = []
-                
-                # For Android
-                if self.platform == "android":
-                    patterns += [
-                        f'resource-id="[^"]*{re.escape(term)}[^"]*"',
-                        f'text="[^"]*{re.escape(term)}[^"]*"',
-                        f'content-desc="[^"]*{re.escape(term)}[^"]*"',
-                        f'class="[^"]*Button[^"]*"[^>]*text="[^"]*"',  # Any button
-                        f'clickable="true"'  # Any clickable element
-                    ]
-                # For iOS
-                else:
-                    patterns += [
-                        f'name="[^"]*{re.escape(term)}[^"]*"',
-                        f'label="[^"]*{re.escape(term)}[^"]*"',
-                        f'value="[^"]*{re.escape(term)}[^"]*"',
-                        f'type="[^"]*Button[^"]*"'  # Any button
-                    ]
-                
-                # Try each pattern
-                for pattern in patterns:
-                    matches = list(re.finditer(pattern, page_source))
+                for match in attribute_re.finditer(page_source):
+                    attribute, value = match.group(1), match.group(2)
+                    if automaton is not None:
+                        found = {term for _, term in automaton.iter(value)}
+                    else:
+                        found = [term for term in present_terms if term in value]
+                    for term in found:
+                        spans = hits.setdefault((term, attribute), [])
+                        if len(spans) < 2:
+                            spans.append(match.span())
+            
+            # Order the matches by term, then attribute
+            matches = []
+            for index, term in enumerate(terms):
+                for attribute in attribute_names:
+                    matches.extend((span, attribute, term) for span in hits.get((term, attribute), ()))
                     
-                    # If found matches, extract windows
-                    for match_index, match in enumerate(matches[:2]):  # Limit to 2 matches per pattern
-                        start_pos = max(0, match.start() - window_size // 2)
-                        end_pos = min(len(page_source), match.end() + window_size // 2)
-                        
-                        # Extract window
-                        window_content = page_source[start_pos:end_pos]
-                        
-                        # Make it well-formed
-                        window_xml = self._make_window_well_formed(window_content)
+                # Any button or clickable element follows the first term's matches
+                if index == 0:
+                    for pattern in generic_patterns:
+                        attribute = pattern.pattern.split('=')[0].replace('"', '')
+                        matches.extend(
+                            (match.span(), attribute, term)
+                            for match in islice(pattern.finditer(page_source), 2)
+                        )
                         
-                        # Add window info
-                        window = {
-                            "window_num": len(windows) + 1,
-                            "match_type": f"text-search",
-                            "match_attribute": pattern.split('=')[0].replace('"', ''),
-                            "match_value": term,
-                            "similarity_score": 0.7,  # Default score for regex matches
-                            "xml": window_xml
-                        }
-                        
-                        windows.append(window)
-                        
-                        # Stop if we have enough windows
-                        if len(windows) >= self.max_windows:
-                            return windows
+                # Stop if we have enough windows
+                if len(matches) >= self.max_windows:
+                    break
+            
+            for (match_start, match_end), attribute, term in matches[:self.max_windows]:
+                start_pos = max(0, match_start - window_size // 2)
+                end_pos = min(len(page_source), match_end + window_size // 2)
+                
+                # Extract window
+                window_content = page_source[start_pos:end_pos]
+                
+                # Make it well-formed
+                window_xml = self._make_window_well_formed(window_content)
+                
+                # Add window info
+                window = {
+                    "window_num": len(windows) + 1,
+                    "match_type": f"text-search",
+                    "match_attribute": attribute,
+                    "match_value": term,
+                    "similarity_score": 0.7,  # Default score for regex matches
+                    "xml": window_xml
+                }
+                
+                windows.append(window)
             
             # If no windows found yet, add the beginning of the page source as fallback
             if not windows and len(page_source) > 0:
@@ -782,29 +2016,17 @@ class CheckerAgent(BaseAgent):
         tag_stack = []
         balanced_end = -1
         
-        # Simple tag matching - not perfect but better than before
-        for i, char in enumerate(window):
-            if char == '<' and i + 1 < len(window):
-                # Check if it's a closing tag
-                if window[i+1] == '/':
-                    tag_close_end = window.find('>', i)
-                    if tag_close_end != -1:
-                        tag_name = window[i+2:tag_close_end].strip().split()[0]
-                        if tag_stack and tag_stack[-1] == tag_name:
-                            tag_stack.pop()
-                            if not tag_stack:
-                                balanced_end = tag_close_end + 1
-                                break
-                # Check if it's an opening tag
-                else:
-                    tag_end = window.find('>', i)
-                    if tag_end != -1:
-                        # Extract tag name
-                        tag_content = window[i+1:tag_end]
-                        tag_name = tag_content.strip().split()[0]
-                        # Skip self-closing tags
-                        if not tag_content.endswith('/'):
-                            tag_stack.append(tag_name)
+        for match in _TAG_RE.finditer(window):
+            closing, tag_name, self_closing = match.groups()
+            if closing:
+                if tag_stack and tag_stack[-1] == tag_name:
+                    tag_stack.pop()
+                    if not tag_stack:
+                        balanced_end = match.end()
+                        break
+            # Skip self-closing tags
+            elif not self_closing:
+                tag_stack.append(tag_name)
         
         # If we found a balanced end, use it
         if balanced_end > 0:
@@ -835,21 +2057,37 @@ class CheckerAgent(BaseAgent):
         Returns:
             List of matching elements
         """
-        matches = []
+        terms = [term.lower() for term in search_terms]
+        
+        # lxml elements cannot key the weak tree index, so their values are
+        # lowercased as they are checked. This is done in Python, as for the
+        # terms: XPath's translate() would only lowercase ASCII letters
+        if has_lxml and isinstance(root, lxml_etree._Element):
+            matches = []
+            if not terms:
+                return matches
+            for element in root.iter("*"):
+                for attr_name in attribute_names:
+                    value = element.get(attr_name)
+                    if not value:
+                        continue
+                    value = value.lower()
+                    if any(term in value for term in terms):
+                        matches.append(element)
+                        break
+            return matches
         
-        # Iterate through all elements
-        for element in root.iter():
-            # Check each attribute
-            for attr_name in attribute_names:
-                attr_value = element.get(attr_name)
-                if attr_value:
-                    # Check if any search term is in the attribute value
-                    for term in search_terms:
-                        if term.lower() in attr_value.lower():
-                            matches.append(element)
-                            break
-                    
-        return matches
+        index = _index_tree(root)
+        
+        # Check the non-empty values of each attribute for any search term
+        positions = set()
+        for attr_name in attribute_names:
+            for position, value in index["attributes"].get(attr_name, ()):
+                if position not in positions and any(term in value for term in terms):
+                    positions.add(position)
+        
+        elements = index["elements"]
+        return [elements[position] for position in sorted(positions)]
     
     def _find_elements_by_type(
         self, 
@@ -870,49 +2108,52 @@ class CheckerAgent(BaseAgent):
         """
         matches = []
         
-        # Create a map of element types to XML element patterns
-        type_patterns = {
-            "button": ["Button", "btn"],
-            "input": ["EditText", "TextField", "Input"],
-            "checkbox": ["CheckBox", "Check"],
-            "switch": ["Switch", "Toggle"],
-            "image": ["Image", "ImageView", "ImageButton"],
-            "list": ["ListView", "RecyclerView", "ScrollView"],
-            "text": ["TextView", "Text", "Label"],
-            "link": ["Link"]
-        }
-        
         # Default to button if no type specified
         if not element_type:
             element_type = "button"
             
         # Get patterns for the element type
-        patterns = type_patterns.get(element_type, [element_type.capitalize()])
+        patterns = _TYPE_PATTERNS_LOWER.get(element_type, (element_type.lower(),))
+        terms = [term.lower() for term in search_terms]
+        
+        # Android also names the type in the 'class' attribute, iOS in 'type'
+        type_attribute = "class" if self.platform == "android" else "type" if self.platform == "ios" else None
+        
+        # lxml elements cannot key the weak tree index, so their tags and
+        # values are lowercased in Python as they are checked, as for the
+        # terms: XPath's translate() would only lowercase ASCII letters
+        if has_lxml and isinstance(root, lxml_etree._Element):
+            if not terms:
+                return matches
+            for element in root.iter("*"):
+                tag = element.tag.lower()
+                element_matches_type = any(pattern in tag for pattern in patterns)
+                
+                if not element_matches_type and type_attribute:
+                    type_value = element.get(type_attribute, "").lower()
+                    element_matches_type = any(pattern in type_value for pattern in patterns)
+                
+                if element_type == "button" and element.get("clickable") == "true":
+                    element_matches_type = True
+                
+                if element_matches_type:
+                    for value in element.values():
+                        value = value.lower()
+                        if any(term in value for term in terms):
+                            matches.append(element)
+                            break
+            return matches
+        
+        index = _index_tree(root)
         
         # Find elements matching the patterns
-        for element in root.iter():
+        for element, tag, attrib in zip(index["elements"], index["tags_lower"], index["attribs_lower"]):
             # Check if element tag matches any pattern
-            element_matches_type = False
-            for pattern in patterns:
-                if pattern.lower() in element.tag.lower():
-                    element_matches_type = True
-                    break
-                    
-            # For Android, also check the 'class' attribute
-            if self.platform == "android":
-                class_attr = element.get("class", "")
-                for pattern in patterns:
-                    if pattern.lower() in class_attr.lower():
-                        element_matches_type = True
-                        break
-                        
-            # For iOS, check the 'type' attribute
-            if self.platform == "ios":
-                type_attr = element.get("type", "")
-                for pattern in patterns:
-                    if pattern.lower() in type_attr.lower():
-                        element_matches_type = True
-                        break
+            element_matches_type = any(pattern in tag for pattern in patterns)
+            
+            if not element_matches_type and type_attribute:
+                type_value = attrib.get(type_attribute, "")
+                element_matches_type = any(pattern in type_value for pattern in patterns)
             
             # Check if the element is clickable (for buttons)
             if element_type == "button" and element.get("clickable") == "true":
@@ -921,14 +2162,10 @@ class CheckerAgent(BaseAgent):
             # If element matches type, check if it also matches search terms
             if element_matches_type:
                 # Check all attributes for search terms
-                for attr_name, attr_value in element.attrib.items():
-                    for term in search_terms:
-                        if term.lower() in attr_value.lower():
-                            matches.append(element)
-                            break
-                    else:
-                        continue
-                    break
+                for value in attrib.values():
+                    if any(term in value for term in terms):
+                        matches.append(element)
+                        break
         
         return matches
     
@@ -936,7 +2173,8 @@ class CheckerAgent(BaseAgent):
         self, 
         element: ET.Element, 
         search_key: str,
-        search_terms: List[str]
+        search_terms: List[str],
+        min_score: float = 0.0
     ) -> float:
         """
         Score a candidate element based on relevance to search terms.
@@ -945,9 +2183,12 @@ class CheckerAgent(BaseAgent):
             element: Candidate element
             search_key: Original search key
             search_terms: List of search terms
+            min_score: Score the caller requires the candidate to exceed.
+                Scoring stops early once the candidate cannot exceed it.
             
         Returns:
-            Relevance score (0.0 to 1.0)
+            Relevance score (0.0 to 1.0), or a partial score not above
+            min_score if scoring stopped early
         """
         score = 0.0
         
@@ -962,118 +2203,156 @@ class CheckerAgent(BaseAgent):
                 element_type_match = 1.0
             elif element.get("class") and element_type_hint in element.get("class").lower():
                 element_type_match = 1.0
-                
-        # Score key attributes more heavily
-        attribute_scores = {}
-        key_attributes = []
         
+        # Enhanced clickable element detection
         if self.platform == "android":
-            key_attributes = ["resource-id", "text", "content-desc"]
-        else:  # iOS
-            key_attributes = ["name", "label", "value"]
+            clickable_score = self._score_clickable_android(element)
+        else:
+            clickable_score = self._score_clickable_ios(element)
+        
+        # Higher boost for clickable elements when looking for buttons
+        if "button" in search_key.lower() or element_type_hint == "button":
+            clickable_boost = clickable_score
+        else:
+            clickable_boost = clickable_score * 0.4
+        
+        # Score key attributes more heavily
+        key_attributes = _KEY_ATTRIBUTES.get(self.platform, _KEY_ATTRIBUTES["ios"])
+        
+        # Read the few key attributes directly and scan the rest for the others
+        attributes = element.attrib
+        key_values = [attributes[attr_name] for attr_name in key_attributes if attr_name in attributes]
+        other_values = [
+            attr_value for attr_name, attr_value in attributes.items()
+            if attr_name not in key_attributes
+        ]
+        bonus = element_type_match * 0.3 + clickable_boost
             
         # Check each attribute for search term matches
-        for attr_name, attr_value in element.attrib.items():
-            best_term_score = 0.0
-            for term in search_terms:
-                # Calculate token similarity
-                token_sim = self._calculate_token_similarity(term, attr_value)
-                
+        # Tokenize on the original case to keep camelCase splits
+        # An exact match (1.0) beats a substring match (0.8), which beats any
+        # token similarity (at most 0.7), so each check only runs when the
+        # stronger ones found nothing
+        lowered_terms = [term.lower() for term in search_terms]
+        exact_terms = frozenset(lowered_terms)
+        term_tokens = [frozenset(_tokenize(term)) for term in search_terms]
+        # Key attributes score more heavily and go first, so a candidate
+        # that misses them is dropped before the others are scored
+        passes = (
+            (key_values, 0.4, len(other_values) * 0.1),
+            (other_values, 0.1, 0.0)
+        )
+        for values, weight, later_bound in passes:
+            for position, attr_value in enumerate(values, 1):
+                value = attr_value.lower()
                 # Check for exact match
-                if term.lower() == attr_value.lower():
-                    term_score = 1.0
+                if value in exact_terms:
+                    best_term_score = 1.0
                 # Check for substring match
-                elif term.lower() in attr_value.lower():
-                    term_score = 0.8
+                elif any(term in value for term in lowered_terms):
+                    best_term_score = 0.8
                 # Use token similarity
                 else:
-                    term_score = token_sim * 0.7
-                    
-                best_term_score = max(best_term_score, term_score)
+                    value_tokens = frozenset(_tokenize(attr_value))
+                    best_term_score = max(
+                        (_jaccard(tokens, value_tokens) for tokens in term_tokens), default=0.0
+                    ) * 0.7
+                score += best_term_score * weight
                 
-            # Store the best score for this attribute
-            attribute_scores[attr_name] = best_term_score
-                
-        # Calculate weighted score
-        for attr_name, attr_score in attribute_scores.items():
-            # Prioritize key attributes
-            if attr_name in key_attributes:
-                score += attr_score * 0.4
-            else:
-                score += attr_score * 0.1
+                # Stop once full marks on the remaining attributes could not lift
+                # the candidate above the caller's threshold
+                if score + bonus + (len(values) - position) * weight + later_bound <= min_score:
+                    return score + bonus
                 
         # Add element type match score
         score += element_type_match * 0.3
         
-        # Enhanced clickable element detection
-        clickable_score = 0.0
-        
-        # Android-specific clickable detection
-        if self.platform == "android":
-            # Direct clickable attribute
-            if element.get("clickable") == "true":
-                clickable_score = 0.5
-                
-            # Check for button in element tag
-            if "button" in element.tag.lower():
-                clickable_score = max(clickable_score, 0.5)
-                
-            # Check for button classes
-            class_attr = element.get("class", "").lower()
-            if "button" in class_attr or "btn" in class_attr:
-                clickable_score = max(clickable_score, 0.4)
-                
-            # Check for touchable elements
-            if element.get("long-clickable") == "true" or element.get("checkable") == "true":
-                clickable_score = max(clickable_score, 0.3)
-                
-        # iOS-specific clickable detection
-        else:
-            # Check for button types
-            if "button" in element.tag.lower():
-                clickable_score = 0.5
-                
-            # Check for tap gesture recognizers
-            if element.get("type", "").lower() in ["xcuielementtypebutton", "xcuielementtypecell"]:
-                clickable_score = 0.5
-                
-            # Check for enabled state
-            if element.get("enabled") == "true":
-                clickable_score += 0.2
-        
-        # Higher boost for clickable elements when looking for buttons
-        if "button" in search_key.lower() or element_type_hint == "button":
-            score += clickable_score
-        else:
-            score += clickable_score * 0.4
+        # Add clickable element score
+        score += clickable_boost
             
         # Normalize score to 0.0-1.0 range
         score = min(1.0, score)
         
         return score
     
-    def _get_element_signature(self, element: ET.Element) -> str:
+    def _score_clickable_android(self, element: ET.Element) -> float:
         """
-        Get a unique signature for an element to detect duplicates.
+        Score how likely an Android element is to be clickable.
         
         Args:
-            element: XML element
+            element: Candidate element
             
         Returns:
-            Element signature string
+            Clickable score (0.0 to 0.5)
         """
-        # Combine tag and important attributes
-        sig_parts = [element.tag]
+        clickable_score = 0.0
         
-        for attr in ['resource-id', 'id', 'name', 'text', 'content-desc', 'label']:
-            if attr in element.attrib:
-                sig_parts.append(f"{attr}:{element.get(attr)}")
-                
-        # Add position information if available
-        if 'bounds' in element.attrib:
-            sig_parts.append(element.get('bounds'))
+        # Direct clickable attribute
+        if element.get("clickable") == "true":
+            clickable_score = 0.5
+            
+        # Check for button in element tag
+        if "button" in element.tag.lower():
+            clickable_score = max(clickable_score, 0.5)
             
-        return "|".join(sig_parts)
+        # Check for button classes
+        class_attr = element.get("class", "").lower()
+        if "button" in class_attr or "btn" in class_attr:
+            clickable_score = max(clickable_score, 0.4)
+            
+        # Check for touchable elements
+        if element.get("long-clickable") == "true" or element.get("checkable") == "true":
+            clickable_score = max(clickable_score, 0.3)
+            
+        return clickable_score
+    
+    def _score_clickable_ios(self, element: ET.Element) -> float:
+        """
+        Score how likely an iOS element is to be clickable.
+        
+        Args:
+            element: Candidate element
+            
+        Returns:
+            Clickable score (0.0 to 0.7)
+        """
+        clickable_score = 0.0
+        
+        # Check for button types
+        if "button" in element.tag.lower():
+            clickable_score = 0.5
+            
+        # Check for tap gesture recognizers
+        if element.get("type", "").lower() in ["xcuielementtypebutton", "xcuielementtypecell"]:
+            clickable_score = 0.5
+            
+        # Check for enabled state
+        if element.get("enabled") == "true":
+            clickable_score += 0.2
+            
+        return clickable_score
+    
+    def _get_element_signature(self, element: ET.Element) -> int:
+        """
+        Get a unique signature for an element to detect duplicates.
+        
+        Args:
+            element: XML element
+            
+        Returns:
+            Hash of the element's tag, important attributes and position
+        """
+        get = element.get
+        return hash((
+            element.tag,
+            get('resource-id'),
+            get('id'),
+            get('name'),
+            get('text'),
+            get('content-desc'),
+            get('label'),
+            get('bounds')
+        ))
     
     def _get_element_match_info(
         self, 
@@ -1093,22 +2372,20 @@ class CheckerAgent(BaseAgent):
         match_info = {"type": "unknown", "attribute": "unknown", "value": "unknown"}
         
         # Prioritize key attributes
-        key_attributes = []
-        if self.platform == "android":
-            key_attributes = ["resource-id", "text", "content-desc"]
-        else:  # iOS
-            key_attributes = ["name", "label", "value"]
+        key_attributes = _KEY_ATTRIBUTES.get(self.platform, _KEY_ATTRIBUTES["ios"])
             
+        terms = [term.lower() for term in search_terms]
+        
         # Look for matches in key attributes first
         for attr_name in key_attributes:
             attr_value = element.get(attr_name)
             if attr_value:
-                for term in search_terms:
-                    if term.lower() in attr_value.lower():
-                        match_info["type"] = "attribute_match"
-                        match_info["attribute"] = attr_name
-                        match_info["value"] = attr_value
-                        return match_info
+                value = attr_value.lower()
+                if any(term in value for term in terms):
+                    match_info["type"] = "attribute_match"
+                    match_info["attribute"] = attr_name
+                    match_info["value"] = attr_value
+                    return match_info
         
         # Check element type
         if "Button" in element.tag or element.get("clickable") == "true":
@@ -1117,14 +2394,16 @@ class CheckerAgent(BaseAgent):
             match_info["value"] = element.tag
             return match_info
             
-        # Check other attributes
+        # Check other attributes, the key ones did not match above
         for attr_name, attr_value in element.attrib.items():
-            for term in search_terms:
-                if term.lower() in attr_value.lower():
-                    match_info["type"] = "attribute_match"
-                    match_info["attribute"] = attr_name
-                    match_info["value"] = attr_value
-                    return match_info
+            if attr_name in key_attributes:
+                continue
+            value = attr_value.lower()
+            if any(term in value for term in terms):
+                match_info["type"] = "attribute_match"
+                match_info["attribute"] = attr_name
+                match_info["value"] = attr_value
+                return match_info
         
         return match_info
     
@@ -1147,7 +2426,7 @@ class CheckerAgent(BaseAgent):
             # Let's create a string representation of this element and important siblings
             
             # First, convert the element itself to string
-            element_str = ET.tostring(element, encoding='unicode')
+            element_str = _element_to_string(element)
             
             # As a simplification, we'll just use this element with a wrapper
             result = f"<context>\n{element_str}\n</context>"
@@ -1159,7 +2438,7 @@ class CheckerAgent(BaseAgent):
             
             # Fallback: just convert the element to string
             try:
-                return ET.tostring(element, encoding='unicode')
+                return _element_to_string(element)
             except:
                 return f"<element>{str(element.attrib)}</element>"
     
@@ -1183,89 +2462,39 @@ class CheckerAgent(BaseAgent):
             Prompt for the LLM
         """
         # Create initial prompt with problem description
-        prompt = f"""
+        parts = [f"""
         You are an expert in mobile UI testing and element identification for {self.platform.upper()} applications.
         
         I'm trying to find an element with identifier: '{missing_element}' but received this error:
         {error_message}
         
         I've extracted {len(windows)} candidate windows from the UI that might contain relevant elements:
-        """
+        """]
         
         # Add each window with its context
-        for window in windows:
-            prompt += f"""
-            
-            WINDOW {window['window_num']} (Match: {window['match_type']} - {window['match_attribute']}="{window['match_value']}", Score: {window['similarity_score']:.2f}):
-            ```xml
-            {window['xml']}
-            ```
-            """
+        parts.extend(_WINDOW_PROMPT_TEMPLATE.format(**window) for window in windows)
         
         # Add information about previous failed suggestions if needed
         if avoid_previous and self.previous_suggestions:
-            prompt += f"""
+            parts.append(f"""
             
             IMPORTANT: The following locators have already been tried and failed, DO NOT suggest these again:
-            {', '.join(sorted(list(self.previous_suggestions)[:5]))}
+            {', '.join(sorted(islice(self.previous_suggestions.values(), 5)))}
             {f"... and {len(self.previous_suggestions) - 5} more" if len(self.previous_suggestions) > 5 else ""}
             
             You MUST suggest a DIFFERENT locator than any of these.
-            """
+            """)
         
         # Add platform-specific instructions
         if self.platform == "android":
-            prompt += """
-            For Android UI elements, prioritize these locator types in this order:
-            1. resource-id: The unique identifier for the element (PREFERRED)
-            2. text: The visible text of the element
-            3. content-desc: The accessibility description
-            4. xpath: XPath expression as a last resort (keep it simple)
-            
-            Example Android responses:
-            {"resource-id": "com.example.app:id/element_id"}
-            or
-            {"text": "Element Text"}
-            or
-            {"content-desc": "Element Description"}
-            or
-            {"xpath": "//android.widget.Button[@text='Element Text']"}
-            """
+            parts.append(_ANDROID_WINDOW_PROMPT_INSTRUCTIONS)
         else:  # iOS
-            prompt += """
-            For iOS UI elements, prioritize these locator types in this order:
-            1. name: The accessibility identifier (PREFERRED)
-            2. label: The accessibility label
-            3. value: The element's value
-            4. xpath: XPath expression as a last resort (keep it simple)
-            
-            Example iOS responses:
-            {"name": "elementName"}
-            or
-            {"label": "Element Label"}
-            or
-            {"value": "Element Value"}
-            or
-            {"xpath": "//XCUIElementTypeButton[@label='Element Label']"}
-            """
+            parts.append(_IOS_WINDOW_PROMPT_INSTRUCTIONS)
             
         # Final instructions
-        prompt += """
-        
-        Based on these UI windows, analyze the XML to find the BEST locator for the element that most closely matches '{missing_element}'.
-        
-        IMPORTANT:
-        1. Prioritize resource-id (Android) or name (iOS) locators over XPath whenever possible
-        2. If using XPath, keep it simple and avoid complex expressions
-        3. Choose the most reliable and unique locator from any window
-        4. For buttons or tap targets, look for elements with clickable="true" or Button in the class/tag
-        5. Pay special attention to elements where clickable="true" when looking for interactive elements
-        
-        Return your answer in JSON format with one of the fields based on what you find.
-        Return ONLY the JSON without any explanation.
-        """
+        parts.append(_WINDOW_PROMPT_INSTRUCTIONS)
 
-        return prompt
+        return "".join(parts)
     
     async def _get_llm_response(self, prompt: str) -> str:
         """
@@ -1283,19 +2512,96 @@ class CheckerAgent(BaseAgent):
                 logger.error("LLM not initialized, cannot get suggestions")
                 return ""
                 
+            system_message = f"You are an expert in mobile UI testing and element identification for {self.platform.upper()} applications. Prioritize resource-id over xpath where possible."
+            
+            # Send the prompt with the others in the current batch, if any
+            if self._pending_prompts is not None:
+                return await self._get_batched_llm_response(prompt, system_message)
+            
             # Use the agent's LLM to generate a response
             messages = [
-                {"role": "system", "content": f"You are an expert in mobile UI testing and element identification for {self.platform.upper()} applications. Prioritize resource-id over xpath where possible."},
+                {"role": "system", "content": system_message},
                 {"role": "user", "content": prompt}
             ]
             
-            response = await self.llm.generate_response(messages)
-            return response.content
+            return await self.generate_response(messages)
             
         except Exception as e:
             logger.warning(f"Error getting LLM response: {str(e)}")
             return ""
     
+    def _focus_page_source(
+        self,
+        page_source: str,
+        missing_element: str,
+        window: int = 500,
+        top_k: int = 3
+    ) -> str:
+        """
+        Reduce a large page source to the regions around the attribute values
+        most similar to the missing element.
+        
+        Args:
+            page_source: Current page source
+            missing_element: The element that could not be found
+            window: Number of characters to keep on each side of a match
+            top_k: Maximum number of matches to keep
+            
+        Returns:
+            The focused page source, or the page source unchanged if it
+            is small enough to send whole
+        """
+        if len(page_source) <= _FOCUS_MIN_LENGTH:
+            return page_source
+        
+        query = missing_element.lower()
+        
+        if has_rapidfuzz:
+            # Score every candidate in one native call
+            matches = list(_ATTRIBUTE_VALUE_RE.finditer(page_source))
+            # Compare resource IDs without their package prefix
+            choices = [match.group(2).rsplit("/", 1)[-1].lower() for match in matches]
+            ranked = process.extract(query, choices, scorer=fuzz.WRatio, limit=top_k)
+            best_matches = [matches[index] for _, _, index in ranked]
+        else:
+            # SequenceMatcher caches details of the second sequence, so fix it once
+            matcher = SequenceMatcher(None)
+            matcher.set_seq2(query)
+            
+            def quick_score(match: "re.Match") -> float:
+                # Compare resource IDs without their package prefix
+                matcher.set_seq1(match.group(2).rsplit("/", 1)[-1].lower())
+                return matcher.quick_ratio()
+            
+            def score(match: "re.Match") -> float:
+                matcher.set_seq1(match.group(2).rsplit("/", 1)[-1].lower())
+                return matcher.ratio()
+            
+            # Shortlist with the cheap upper bound, then rank the shortlist exactly
+            shortlist = heapq.nlargest(top_k * 4, _ATTRIBUTE_VALUE_RE.finditer(page_source), key=quick_score)
+            best_matches = heapq.nlargest(top_k, shortlist, key=score)
+        if not best_matches:
+            return page_source[:_FULL_PAGE_MAX_LENGTH]
+        
+        # Merge overlapping spans, snapping them to tag boundaries
+        spans = []
+        for match in sorted(best_matches, key=lambda m: m.start()):
+            start = max(0, match.start() - window)
+            end = min(len(page_source), match.end() + window)
+            tag_start = page_source.rfind("<", 0, start + 1)
+            tag_end = page_source.find(">", end - 1)
+            start = tag_start if tag_start != -1 else start
+            end = tag_end + 1 if tag_end != -1 else end
+            
+            if spans and start <= spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], end)
+            else:
+                spans.append([start, end])
+        
+        focused_source = "\n...\n".join(page_source[start:end] for start, end in spans)
+        logger.debug(f"Focused page source from {len(page_source)} to {len(focused_source)} characters")
+        return focused_source
+    
     async def _get_llm_suggestion_with_full_page(
         self, 
         missing_element: str, 
@@ -1304,7 +2610,8 @@ class CheckerAgent(BaseAgent):
         failed_suggestions: List[str] = []
     ) -> Optional[Dict[str, str]]:
         """
-        Method for getting LLM suggestion with the entire page source.
+        Method for getting LLM suggestion with the page source, reduced to
+        excerpts around the best matches when it is large.
         Used as a last resort when no window-based matches are found.
         
         Args:
@@ -1322,87 +2629,63 @@ class CheckerAgent(BaseAgent):
                 logger.error("LLM not initialized, cannot get suggestions")
                 return None
                 
-            # Create a simple prompt with the full page source
-            # Truncate page source if it's too large
-            max_source_length = 12000  # Increased from 10000
-            if len(page_source) > max_source_length:
-                truncated_source = page_source[:max_source_length] + "... (truncated)"
+            # Reduce a large page source to the regions around the best matches
+            focused_source = self._focus_page_source(page_source, str(missing_element))
+            
+            # Truncate page source if it's still too large
+            if len(focused_source) > _FULL_PAGE_MAX_LENGTH:
+                truncated_source = focused_source[:_FULL_PAGE_MAX_LENGTH] + "... (truncated)"
             else:
-                truncated_source = page_source
+                truncated_source = focused_source
+            
+            # Only claim the page is complete when it is sent whole
+            if truncated_source == page_source:
+                source_description = "Here is the COMPLETE page source of the app. Make sure to analyze it thoroughly:"
+            else:
+                source_description = (
+                    "Here are EXCERPTS of the page source around the elements most likely to match. "
+                    "Other parts of the page are not shown, so an element missing from them may still exist:"
+                )
                 
-            prompt = f"""
+            parts = [f"""
             You are an expert in mobile UI testing and element identification for {self.platform.upper()} applications.
             
             I'm trying to find an element with identifier: '{missing_element}' but received this error:
             {error_message}
             
-            Here is the COMPLETE page source of the app. Make sure to analyze it thoroughly:
+            {source_description}
             
             ```xml
             {truncated_source}
             ```
-            """
+            """]
             
             # Add information about previous failed suggestions if needed
             if failed_suggestions:
-                prompt += f"""
+                parts.append(f"""
                 
                 IMPORTANT: The following locators have already been tried and failed, DO NOT suggest these again:
                 {', '.join(failed_suggestions[:5])}
                 {f"... and {len(failed_suggestions) - 5} more" if len(failed_suggestions) > 5 else ""}
                 
                 You MUST suggest a DIFFERENT locator than any of these.
-                """
+                """)
             
             # Add platform-specific instructions
             if self.platform == "android":
-                prompt += """
-                For Android UI elements, look for these attributes in order of preference:
-                1. resource-id: The unique identifier (MOST RELIABLE)
-                2. text: The visible text 
-                3. content-desc: The accessibility description
-                4. clickable="true" attribute for interactive elements
-                5. class attributes that indicate the element type (Button, TextView, etc.)
-                
-                Return your answer in JSON format with one of these fields:
-                - "resource-id": if you find a matching resource ID
-                - "text": if you find matching text content
-                - "content-desc": if you find a matching content description
-                - "xpath": if you need to provide an XPath expression (as a last resort)
-                
-                Prioritize resource-id over xpath where possible.
-                """
+                parts.append(_ANDROID_FULL_PAGE_PROMPT_INSTRUCTIONS)
             else:  # iOS
-                prompt += """
-                For iOS UI elements, look for these attributes in order of preference:
-                1. name: The accessibility identifier (MOST RELIABLE)
-                2. label: The accessibility label
-                3. value: The element's value
-                4. type attributes that indicate the element type (Button, etc.)
-                
-                Return your answer in JSON format with one of these fields:
-                - "name": if you find a matching name
-                - "label": if you find a matching label
-                - "value": if you find a matching value
-                - "xpath": if you need to provide an XPath expression (as a last resort)
-                
-                Prioritize name over xpath where possible.
-                """
+                parts.append(_IOS_FULL_PAGE_PROMPT_INSTRUCTIONS)
                 
             # Final instructions
-            prompt += """
-            
-            Remember to look for CLICKABLE ELEMENTS when the target appears to be a button.
-            Elements with clickable="true" attribute are interactive and often represent buttons.
-            
-            RETURN ONLY THE JSON without any explanation.
-            """
+            parts.append(_FULL_PAGE_PROMPT_INSTRUCTIONS)
+            prompt = "".join(parts)
             
             # Get LLM response
             llm_response = await self._get_llm_response(prompt)
             
             # Extract JSON from response
-            suggestion = extract_json(llm_response)
+            suggestion = _parse_llm_json(llm_response)
             if suggestion:
                 return suggestion
             
@@ -1433,7 +2716,7 @@ class CheckerAgent(BaseAgent):
         """
         # Just use the full page method as that's more comprehensive
         return await self._get_llm_suggestion_with_full_page(
-            missing_element, error_message, page_source, list(self.previous_suggestions)
+            missing_element, error_message, page_source, list(self.previous_suggestions.values())
         )
     
     def _extract_locator_from_text(self, text: str) -> Optional[Dict[str, str]]:
@@ -1447,60 +2730,15 @@ class CheckerAgent(BaseAgent):
         Returns:
             Dictionary containing the locator or None if not found
         """
-        # Common locators for both platforms
-        common_patterns = [
-            (r'text["\']?\s*:\s*["\']([^"\']+)["\']', "text"),
-            (r'xpath["\']?\s*:\s*["\']([^"\']+)["\']', "xpath"),
-        ]
+        # Every locator is stated with a colon, so text without one has none
+        if ":" not in text:
+            return None
         
-        # Platform-specific patterns
-        if self.platform == "android":
-            patterns = [
-                (r'resource-id["\']?\s*:\s*["\']([^"\']+)["\']', "resource-id"),
-                (r'content-desc["\']?\s*:\s*["\']([^"\']+)["\']', "content-desc"),
-                (r'ui-selector["\']?\s*:\s*["\']([^"\']+)["\']', "ui-selector"),
-            ] + common_patterns
-        else:  # iOS
-            patterns = [
-                (r'name["\']?\s*:\s*["\']([^"\']+)["\']', "name"),
-                (r'label["\']?\s*:\s*["\']([^"\']+)["\']', "label"),
-                (r'value["\']?\s*:\s*["\']([^"\']+)["\']', "value"),
-                (r'predicate["\']?\s*:\s*["\']([^"\']+)["\']', "predicate"),
-                (r'class-chain["\']?\s*:\s*["\']([^"\']+)["\']', "class-chain"),
-            ] + common_patterns
-        
-        # Try each pattern, prioritizing resource-id/name over xpath
-        result = {}
-        for pattern, key in patterns:
-            match = re.search(pattern, text)
+        # The first pattern to match is the most preferred locator
+        for pattern, key in _LOCATOR_PATTERNS.get(self.platform, _LOCATOR_PATTERNS["ios"]):
+            match = pattern.search(text)
             if match:
-                result[key] = match.group(1)
-                # If we found a resource-id or name, return immediately
-                if key in ["resource-id", "name"]:
-                    return {key: match.group(1)}
-        
-        # If we found multiple locators, prioritize appropriately
-        if result:
-            # For Android, prefer resource-id > text > content-desc > xpath
-            if self.platform == "android":
-                if "resource-id" in result:
-                    return {"resource-id": result["resource-id"]}
-                elif "text" in result:
-                    return {"text": result["text"]}
-                elif "content-desc" in result:
-                    return {"content-desc": result["content-desc"]}
-                elif "xpath" in result:
-                    return {"xpath": result["xpath"]}
-            # For iOS, prefer name > label > value > xpath
-            else:
-                if "name" in result:
-                    return {"name": result["name"]}
-                elif "label" in result:
-                    return {"label": result["label"]}
-                elif "value" in result:
-                    return {"value": result["value"]}
-                elif "xpath" in result:
-                    return {"xpath": result["xpath"]}
+                return {key: match.group(1)}
                 
         return None
         
@@ -1522,52 +2760,42 @@ class CheckerAgent(BaseAgent):
         if "xpath" in locator:
             xpath = locator["xpath"]
             
-            # Check if the XPath contains "//" within attribute values
+            # Check if the XPath contains "//" within attribute values. Two plain
+            # substring tests beat a compiled pattern or a str.find prefilter
+            # on XPath-sized strings
             if "'//" in xpath or "\"//" in xpath:
                 logger.warning(f"Detected recursive XPath, simplifying: {xpath}")
                 # Try to extract a core search term
-                search_terms = re.findall(r"contains\(@\w+,\s*'([^/]+)'\)", xpath)
-                if search_terms:
-                    term = search_terms[0].split("//")[0].strip()
+                search_term_match = _CONTAINS_TERM_RE.search(xpath)
+                if search_term_match:
+                    term = search_term_match.group(1).split("//")[0].strip()
                     if term:
                         # Create a simpler XPath with the extracted term
-                        if self.platform == "android":
-                            locator["xpath"] = f"//android.widget.Button[contains(@text, '{term}')]"
-                        else:
-                            locator["xpath"] = f"//XCUIElementTypeButton[contains(@name, '{term}')]"
+                        locator["xpath"] = self._build_simple_xpath(term)
                 else:
-                    # Fallback to extract any content in quotes
-                    simple_terms = re.findall(r"'([^']+)'", xpath)
-                    if simple_terms:
-                        term = simple_terms[0]
-                        if self.platform == "android":
-                            locator["xpath"] = f"//android.widget.Button[contains(@text, '{term}')]"
-                        else:
-                            locator["xpath"] = f"//XCUIElementTypeButton[contains(@name, '{term}')]"
+                    # Fallback to the first non-empty content in quotes
+                    term = next((part for part in xpath.split("'")[1:-1] if part), None)
+                    if term:
+                        locator["xpath"] = self._build_simple_xpath(term)
                     else:
                         # No viable term found, remove the xpath
                         locator.pop("xpath")
             
             # Check for excessive complexity in XPath
-            complexity = xpath.count("contains") + xpath.count("or") + xpath.count("and")
+            complexity = len(_COMPLEXITY_RE.findall(xpath))
             if complexity > 5:  # Higher threshold for complexity
                 logger.warning(f"XPath too complex (score {complexity}), simplifying: {xpath}")
                 # Extract element type
-                element_type_match = re.match(r'//([^/\[\]]+)', xpath)
-                element_type = element_type_match.group(1) if element_type_match else (
-                    "android.widget.Button" if self.platform == "android" else "XCUIElementTypeButton"
-                )
+                element_type_match = _ELEMENT_TYPE_RE.match(xpath)
+                element_type = element_type_match.group(1) if element_type_match else None
                 
                 # Extract the first search term
-                search_term_match = re.search(r"contains\(@\w+,\s*'([^']+)'\)", xpath)
+                search_term_match = _SEARCH_TERM_RE.search(xpath)
                 if search_term_match:
                     term = search_term_match.group(1).strip()
                     if term:
                         # Create a simpler XPath with just one condition
-                        if self.platform == "android":
-                            locator["xpath"] = f"//{element_type}[contains(@text, '{term}')]"
-                        else:
-                            locator["xpath"] = f"//{element_type}[contains(@name, '{term}')]"
+                        locator["xpath"] = self._build_simple_xpath(term, element_type)
                 else:
                     # No viable term found, remove the xpath
                     locator.pop("xpath")
@@ -1578,14 +2806,32 @@ class CheckerAgent(BaseAgent):
             locator.pop("xpath")
             
         # Ensure text doesn't include XPath expressions
-        if "text" in locator and ("//" in locator["text"] or "@" in locator["text"]):
-            logger.warning(f"Text contains XPath characters, cleaning: {locator['text']}")
-            locator["text"] = re.sub(r'[/\[\]@=]', '', locator["text"])
-            
-        # Check for empty values
-        for key, value in list(locator.items()):
-            if not value or len(str(value)) < 1:
-                logger.warning(f"Removing empty value for {key}")
-                locator.pop(key)
+        # Single slashes and equals signs are common in plain UI text,
+        # so only a recursive path or an attribute reference counts
+        text = locator.get("text", "")
+        if "//" in text or "@" in text:
+            logger.warning(f"Text contains XPath characters, cleaning: {text}")
+            locator["text"] = text.translate(_XPATH_STRIP_TABLE)
+            
+        # Check for empty values, in place as callers test the suggestion they passed
+        for key in [key for key, value in locator.items() if not value]:
+            logger.warning(f"Removing empty value for {key}")
+            del locator[key]
                 
-        return locator
\ No newline at end of file
+        return locator
+    
+    def _build_simple_xpath(self, term: str, element_type: Optional[str] = None) -> str:
+        """
+        Build a single-condition XPath searching the platform's main attribute.
+        
+        Args:
+            term: Term the attribute must contain
+            element_type: Element type to match, the platform's button type if None
+            
+        Returns:
+            Simplified XPath
+        """
+        default_type, attribute = _SIMPLE_XPATH_PARTS.get(self.platform, _SIMPLE_XPATH_PARTS["ios"])
+        return _SIMPLE_XPATH_TEMPLATE.format(
+            element_type=element_type or default_type, attribute=attribute, term=term
+        )
\ No newline at end of file
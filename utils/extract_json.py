@@ -9,6 +9,65 @@ import json
 import re
 from typing import Any, Dict, Optional
 
+# Use orjson's native parser if available, its errors subclass json.JSONDecodeError
+try:
+    from orjson import loads as _loads
+except ImportError:
+    _loads = json.loads
+
+# JSON in ```json code blocks, and in code blocks of any language
+_JSON_CODE_BLOCK_RE = re.compile(r'```json\n(.*?)\n```', re.DOTALL)
+_CODE_BLOCK_RE = re.compile(r'```(?:json)?\n(.*?)\n```', re.DOTALL)
+
+# Everything from the first opening to the last closing brace or bracket
+_BRACE_RE = re.compile(r'\{.*\}', re.DOTALL)
+_BRACKET_RE = re.compile(r'\[.*\]', re.DOTALL)
+
+# "key": value pairs in text that is not valid JSON
+_KEY_VALUE_RE = re.compile(
+    r'"([^"]+)"\s*:\s*("[^"]*"|\'[^\']*\'|\d+|\d+\.\d+|true|false|null|\{.*?\}|\[.*?\])',
+    re.DOTALL
+)
+
+
+def _find_json_object(text: str) -> Optional[str]:
+    """
+    Find the first balanced JSON object in text.
+    Braces inside JSON strings are skipped.
+
+    Args:
+        text: Text that may contain a JSON object
+        
+    Returns:
+        Text of the first balanced object or None if there is none
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+    
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == '\\':
+                escaped = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    
+    return None
+
 
 def extract_json(text: str) -> Optional[Dict[str, Any]]:
     """
@@ -22,44 +81,51 @@ def extract_json(text: str) -> Optional[Dict[str, Any]]:
     """
     if not text:
         return None
+    
+    # Fast path: the first balanced object, which is what LLM responses usually hold
+    candidate = _find_json_object(text)
+    if candidate is not None:
+        try:
+            result = _loads(candidate)
+            if isinstance(result, dict):
+                return result
+        except json.JSONDecodeError:
+            pass
         
     # Try to find JSON in code blocks marked with ```json
-    json_code_pattern = r'```json\n(.*?)\n```'
-    matches = re.findall(json_code_pattern, text, re.DOTALL)
+    matches = _JSON_CODE_BLOCK_RE.findall(text)
     
     for match in matches:
         try:
             cleaned_match = match.strip()
-            return json.loads(cleaned_match)
+            return _loads(cleaned_match)
         except json.JSONDecodeError:
             continue
     
     # Try to find braces that could contain JSON objects
-    brace_pattern = r'\{.*\}'
-    matches = re.findall(brace_pattern, text, re.DOTALL)
+    matches = _BRACE_RE.findall(text)
     
     for match in matches:
         try:
             # If there are nested objects, this could be complex
             # Only return if we can parse it completely
-            return json.loads(match.strip())
+            return _loads(match.strip())
         except json.JSONDecodeError:
             continue
     
     # Try to find brackets that could contain JSON arrays
-    bracket_pattern = r'\[.*\]'
-    matches = re.findall(bracket_pattern, text, re.DOTALL)
+    matches = _BRACKET_RE.findall(text)
     
     for match in matches:
         try:
-            return json.loads(match.strip())
+            return _loads(match.strip())
         except json.JSONDecodeError:
             continue
     
     # Try parsing the entire text as JSON (removing any leading/trailing text)
     cleaned_text = text.strip()
     try:
-        return json.loads(cleaned_text)
+        return _loads(cleaned_text)
     except json.JSONDecodeError:
         pass
     
@@ -71,7 +137,7 @@ def extract_json(text: str) -> Optional[Dict[str, Any]]:
         
         if start != -1 and end != -1 and start < end:
             potential_json = text[start:end+1]
-            return json.loads(potential_json)
+            return _loads(potential_json)
     except (json.JSONDecodeError, ValueError):
         pass
     
@@ -94,24 +160,22 @@ def extract_json_list(text: str) -> Optional[list]:
         return None
         
     # Try to find JSON lists in code blocks
-    json_code_pattern = r'```(?:json)?\n(.*?)\n```'
-    matches = re.findall(json_code_pattern, text, re.DOTALL)
+    matches = _CODE_BLOCK_RE.findall(text)
     
     for match in matches:
         try:
-            result = json.loads(match.strip())
+            result = _loads(match.strip())
             if isinstance(result, list):
                 return result
         except json.JSONDecodeError:
             continue
     
     # Try to find brackets that could contain JSON arrays
-    bracket_pattern = r'\[.*\]'
-    matches = re.findall(bracket_pattern, text, re.DOTALL)
+    matches = _BRACKET_RE.findall(text)
     
     for match in matches:
         try:
-            result = json.loads(match.strip())
+            result = _loads(match.strip())
             if isinstance(result, list):
                 return result
         except json.JSONDecodeError:
@@ -120,7 +184,7 @@ def extract_json_list(text: str) -> Optional[list]:
     # Try parsing the entire text as JSON list
     cleaned_text = text.strip()
     try:
-        result = json.loads(cleaned_text)
+        result = _loads(cleaned_text)
         if isinstance(result, list):
             return result
     except json.JSONDecodeError:
@@ -134,7 +198,7 @@ def extract_json_list(text: str) -> Optional[list]:
         
         if start != -1 and end != -1 and start < end:
             potential_json = text[start:end+1]
-            result = json.loads(potential_json)
+            result = _loads(potential_json)
             if isinstance(result, list):
                 return result
     except (json.JSONDecodeError, ValueError):
@@ -156,13 +220,12 @@ def extract_key_value_pairs(text: str) -> Dict[str, Any]:
     result = {}
     
     # Look for patterns like "key": value or "key" : value
-    pattern = r'"([^"]+)"\s*:\s*("[^"]*"|\'[^\']*\'|\d+|\d+\.\d+|true|false|null|\{.*?\}|\[.*?\])'
-    matches = re.findall(pattern, text, re.DOTALL)
+    matches = _KEY_VALUE_RE.findall(text)
     
     for key, value in matches:
         try:
             # Try to parse the value as JSON
-            parsed_value = json.loads(value)
+            parsed_value = _loads(value)
             result[key] = parsed_value
         except json.JSONDecodeError:
             # If parsing fails, use the string value